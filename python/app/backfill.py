@@ -0,0 +1,270 @@
+"""
+Historical Backfill
+Command-line tool that runs the detectors over a date range and a list of
+regions in a process pool, writing one partition per date/region and
+checkpointing progress so interrupted runs resume where they stopped.
+
+Usage:
+    python -m app.backfill --start 2025-06-01 --end 2025-08-31 \\
+        --region canyons=38.5,-74.5,40.5,-71.5 --out data/backfill
+
+    # Offline, from archived NetCDF files instead of CMEMS
+    python -m app.backfill --start 2025-06-01 --end 2025-06-30 \\
+        --region-file regions.json --source local --nc-dir /data/cmems
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FILE = "_progress.jsonl"
+SUCCESS_MARKER = "_SUCCESS"
+
+# Default local file layout; {date} is formatted as YYYY-MM-DD
+DEFAULT_SST_PATTERN = "sst_{date}.nc"
+DEFAULT_CHL_PATTERN = "chl_{date}.nc"
+
+OUTPUT_EXTENSIONS = {"fgb": "features.fgb", "arrow": "features.arrow"}
+
+
+@dataclass
+class Region:
+    """Named bounding box"""
+    name: str
+    south: float
+    west: float
+    north: float
+    east: float
+
+
+@dataclass
+class BackfillTask:
+    """One date/region partition"""
+    date: str
+    region: Region
+    out_dir: str
+    output_format: str
+    source: str
+    nc_dir: Optional[str] = None
+    sst_pattern: str = DEFAULT_SST_PATTERN
+    chl_pattern: str = DEFAULT_CHL_PATTERN
+
+    @property
+    def partition(self) -> str:
+        return f"date={self.date}/region={self.region.name}"
+
+    @property
+    def partition_dir(self) -> str:
+        return os.path.join(self.out_dir, f"date={self.date}", f"region={self.region.name}")
+
+
+def parse_region(spec: str) -> Region:
+    """Parse 'name=south,west,north,east'"""
+    try:
+        name, bbox = spec.split("=", 1)
+        south, west, north, east = map(float, bbox.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Invalid region '{spec}'. Expected: name=south,west,north,east"
+        )
+    return Region(name.strip(), south, west, north, east)
+
+
+def load_region_file(path: str) -> List[Region]:
+    """Load regions from JSON: {"name": [south, west, north, east], ...}"""
+    with open(path) as f:
+        spec = json.load(f)
+    return [Region(name, *map(float, bbox)) for name, bbox in spec.items()]
+
+
+def date_range(start: str, end: str) -> Iterator[str]:
+    """Inclusive range of ISO dates"""
+    day = datetime.strptime(start, "%Y-%m-%d")
+    last = datetime.strptime(end, "%Y-%m-%d")
+    while day <= last:
+        yield day.strftime("%Y-%m-%d")
+        day += timedelta(days=1)
+
+
+def load_progress(out_dir: str) -> Set[str]:
+    """Partitions recorded as completed in the checkpoint file"""
+    done = set()
+    path = os.path.join(out_dir, PROGRESS_FILE)
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn last line from an interrupted run
+            if record.get("status") == "ok":
+                done.add(record["partition"])
+    return done
+
+
+def is_complete(task: BackfillTask, done: Set[str]) -> bool:
+    """A partition is done if checkpointed and its success marker exists"""
+    return task.partition in done and os.path.exists(
+        os.path.join(task.partition_dir, SUCCESS_MARKER)
+    )
+
+
+def _load_grids(task: BackfillTask) -> Tuple[Optional[tuple], Optional[tuple]]:
+    """Load SST and CHL grids for a task from CMEMS or local NetCDF files"""
+    from app import copernicus_data as cd
+
+    r = task.region
+    if task.source == "local":
+        sst_path = os.path.join(task.nc_dir, task.sst_pattern.format(date=task.date))
+        chl_path = os.path.join(task.nc_dir, task.chl_pattern.format(date=task.date))
+        sst = cd.load_netcdf_grid(sst_path, "thetao", r.west, r.east, r.south, r.north)
+        chl = cd.load_netcdf_grid(chl_path, "CHL", r.west, r.east, r.south, r.north)
+    else:
+        day = datetime.strptime(task.date, "%Y-%m-%d")
+        sst = cd.fetch_sst_data(r.west, r.east, r.south, r.north, day)
+        chl = cd.fetch_chlorophyll_data(r.west, r.east, r.south, r.north, day)
+    return sst, chl
+
+
+def run_partition(task: BackfillTask) -> Dict:
+    """
+    Detect features for one date/region and write its partition
+
+    Runs in a pool worker. Output is written to a temporary file and renamed
+    into place before the success marker is created, so a crash never leaves
+    a partition that looks complete. Partitions missing one product are
+    recorded as "partial" without output or marker and rerun on resume.
+
+    Returns:
+        Checkpoint record for the partition
+    """
+    from app.copernicus_data import detect_features_on_grids
+
+    start = time.perf_counter()
+    record = {"partition": task.partition, "date": task.date, "region": task.region.name}
+    try:
+        sst, chl = _load_grids(task)
+        if sst is None and chl is None:
+            return {**record, "status": "missing", "error": "no SST or CHL data"}
+        if sst is None or chl is None:
+            # Usually a transient fetch failure: write nothing so resume retries it
+            missing = "SST" if sst is None else "CHL"
+            return {**record, "status": "partial", "error": f"no {missing} data"}
+
+        features = detect_features_on_grids(sst, chl)
+        if task.output_format == "fgb":
+            payload = features.to_flatgeobuf()
+        else:
+            payload = features.to_arrow_ipc()
+
+        os.makedirs(task.partition_dir, exist_ok=True)
+        target = os.path.join(task.partition_dir, OUTPUT_EXTENSIONS[task.output_format])
+        tmp = target + f".tmp-{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, target)
+        with open(os.path.join(task.partition_dir, SUCCESS_MARKER), "w") as f:
+            f.write(datetime.now().isoformat())
+
+        return {
+            **record,
+            "status": "ok",
+            "feature_count": len(features),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+    except Exception as e:
+        return {**record, "status": "error", "error": str(e)}
+
+
+def build_tasks(args: argparse.Namespace, regions: List[Region]) -> List[BackfillTask]:
+    return [
+        BackfillTask(
+            date=date, region=region, out_dir=args.out, output_format=args.format,
+            source=args.source, nc_dir=args.nc_dir,
+            sst_pattern=args.sst_pattern, chl_pattern=args.chl_pattern
+        )
+        for date in date_range(args.start, args.end)
+        for region in regions
+    ]
+
+
+def run_backfill(tasks: List[BackfillTask], out_dir: str, workers: int) -> Dict[str, int]:
+    """
+    Run pending tasks in a process pool, checkpointing each result
+
+    Returns:
+        Count of partitions per status, including "skipped"
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    done = load_progress(out_dir)
+    pending = [t for t in tasks if not is_complete(t, done)]
+    summary = {"skipped": len(tasks) - len(pending)}
+    logger.info(f"Backfill: {len(pending)} partitions to run, {summary['skipped']} already done")
+
+    progress_path = os.path.join(out_dir, PROGRESS_FILE)
+    with open(progress_path, "a") as progress, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_partition, task): task for task in pending}
+        for future in as_completed(futures):
+            record = future.result()
+            record["finished_at"] = datetime.now().isoformat()
+            progress.write(json.dumps(record) + "\n")
+            progress.flush()
+            os.fsync(progress.fileno())
+
+            summary[record["status"]] = summary.get(record["status"], 0) + 1
+            if record["status"] == "ok":
+                logger.info(f"{record['partition']}: {record['feature_count']} features in {record['seconds']}s")
+            else:
+                logger.warning(f"{record['partition']}: {record['status']} ({record.get('error')})")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill historical ocean features")
+    parser.add_argument("--start", required=True, help="First date (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, help="Last date, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--region", action="append", type=parse_region, default=[],
+                        help="Region as name=south,west,north,east (repeatable)")
+    parser.add_argument("--region-file", help="JSON file of {name: [south, west, north, east]}")
+    parser.add_argument("--out", default="backfill", help="Output directory")
+    parser.add_argument("--format", choices=sorted(OUTPUT_EXTENSIONS), default="fgb",
+                        help="Partition file format: FlatGeobuf or GeoArrow IPC")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--source", choices=["cmems", "local"], default="cmems")
+    parser.add_argument("--nc-dir", help="Directory of NetCDF files for --source local")
+    parser.add_argument("--sst-pattern", default=DEFAULT_SST_PATTERN,
+                        help="SST file name pattern under --nc-dir ({date} = YYYY-MM-DD)")
+    parser.add_argument("--chl-pattern", default=DEFAULT_CHL_PATTERN,
+                        help="CHL file name pattern under --nc-dir ({date} = YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    regions = list(args.region)
+    if args.region_file:
+        regions.extend(load_region_file(args.region_file))
+    if not regions:
+        parser.error("at least one --region or --region-file is required")
+    if args.source == "local" and not args.nc_dir:
+        parser.error("--nc-dir is required with --source local")
+
+    logging.basicConfig(level=logging.INFO)
+    summary = run_backfill(build_tasks(args, regions), args.out, args.workers)
+    print(json.dumps(summary))
+    return 1 if summary.get("error") or summary.get("partial") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Front Climatology
+Streaming per-pixel aggregation of daily SST grids: front-occurrence counts,
+mean gradient and running SST mean/variance (Welford) in fixed-size
+accumulators, so memory is constant in the number of days
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import logging
+
+from app.feature_collection import FeatureColumns
+from app.masks import resolve_mask
+from app.ocean_features import OceanFeatureDetector
+
+logger = logging.getLogger(__name__)
+
+PERSISTENCE_SCHEMA = {"feature_type": "str", "front_frequency": "float", "days": "int", "id": "str"}
+
+
+class FrontClimatology:
+    """
+    Fixed-size accumulators over a stream of same-shaped daily SST grids
+
+    Each update() runs the thermal front gradient and thresholding steps of
+    OceanFeatureDetector on one day and folds the result into int32/float64
+    arrays the size of a single grid; the daily grid can be dropped afterwards.
+    Pixels that are NaN on a given day (land, cloud) do not count as observed.
+    The land mask of the first day is kept and reused while later days have
+    no extra gaps.
+    """
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray, threshold: float = 0.5,
+                 detector: Optional[OceanFeatureDetector] = None):
+        self.lon = np.asarray(lon)
+        self.lat = np.asarray(lat)
+        self.threshold = threshold
+        self.detector = detector or OceanFeatureDetector.from_env()
+        self.mask = None
+
+        shape = (len(self.lat), len(self.lon))
+        self.days = 0
+        self.observed = np.zeros(shape, dtype=np.int32)
+        self.front_count = np.zeros(shape, dtype=np.int32)
+        self.gradient_sum = np.zeros(shape, dtype=np.float64)
+        self.sst_mean = np.zeros(shape, dtype=np.float64)
+        self.sst_m2 = np.zeros(shape, dtype=np.float64)
+
+    @property
+    def shape(self):
+        return self.observed.shape
+
+    def update(self, sst: np.ndarray) -> None:
+        """Fold one day's SST grid into the accumulators"""
+        if sst.shape != self.shape:
+            raise ValueError(f"Grid shape {sst.shape} does not match climatology shape {self.shape}")
+
+        valid = ~np.isnan(sst)
+        mask = resolve_mask(sst, self.mask)
+        if self.mask is None:
+            self.mask = mask
+        gradient_km = self.detector.thermal_gradient_km(sst, self.lon, self.lat, mask)
+        fronts = self.detector.front_mask(gradient_km, self.threshold) & valid
+
+        self.days += 1
+        self.observed += valid
+        self.front_count += fronts
+        self.gradient_sum += np.where(valid, gradient_km, 0.0)
+
+        # Welford update on observed pixels only
+        n = self.observed
+        delta = np.where(valid, sst - self.sst_mean, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.sst_mean += np.where(valid, delta / np.maximum(n, 1), 0.0)
+        self.sst_m2 += np.where(valid, delta * (sst - self.sst_mean), 0.0)
+
+    def update_many(self, grids: Iterable[np.ndarray]) -> "FrontClimatology":
+        """Consume an iterator of daily grids (e.g. a generator over fetches)"""
+        for sst in grids:
+            self.update(sst)
+        return self
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+
+    def _per_observation(self, values: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = values / self.observed
+        out[self.observed == 0] = np.nan
+        return out
+
+    def front_frequency(self) -> np.ndarray:
+        """Fraction of observed days each pixel was on a front"""
+        return self._per_observation(self.front_count.astype(np.float64))
+
+    def mean_gradient(self) -> np.ndarray:
+        """Mean gradient magnitude (°C/km) over observed days"""
+        return self._per_observation(self.gradient_sum)
+
+    def sst_variance(self) -> np.ndarray:
+        """Sample variance of SST over observed days (NaN with fewer than 2)"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out = self.sst_m2 / (self.observed - 1)
+        out[self.observed < 2] = np.nan
+        return out
+
+    def layers(self) -> Dict[str, np.ndarray]:
+        """All result rasters keyed by layer name"""
+        mean = self.sst_mean.copy()
+        mean[self.observed == 0] = np.nan
+        return {
+            "front_frequency": self.front_frequency(),
+            "mean_gradient": self.mean_gradient(),
+            "sst_mean": mean,
+            "sst_variance": self.sst_variance(),
+            "observed_days": self.observed.astype(np.float64),
+        }
+
+    def to_raster(self, layers: Optional[Sequence[str]] = None, precision: int = 4) -> Dict:
+        """
+        JSON-friendly raster payload (NaN becomes null)
+
+        Args:
+            layers: Layer names to include (all by default)
+            precision: Decimal places kept
+        """
+        all_layers = self.layers()
+        names = layers or list(all_layers)
+        out = {}
+        for name in names:
+            values = np.round(all_layers[name], precision).astype(object)
+            values[np.isnan(all_layers[name])] = None
+            out[name] = values.tolist()
+        return {
+            "type": "Raster",
+            "lon": np.round(self.lon.astype(np.float64), 6).tolist(),
+            "lat": np.round(self.lat.astype(np.float64), 6).tolist(),
+            "layers": out,
+            "days": self.days,
+            "threshold": self.threshold
+        }
+
+    def persistence_contours(self, levels: Sequence[float] = (0.25, 0.5, 0.75),
+                             as_columns: bool = False):
+        """
+        Contour the front-frequency raster into persistence isolines
+
+        Args:
+            levels: Front-frequency levels (fraction of observed days)
+            as_columns: Return the columnar FeatureColumns instead of dicts
+
+        Returns:
+            List of LineString features as GeoJSON-like dicts (or FeatureColumns)
+        """
+        from skimage import measure
+
+        frequency = np.nan_to_num(self.front_frequency(), nan=0.0)
+        features = FeatureColumns(PERSISTENCE_SCHEMA)
+        for level in levels:
+            for i, contour in enumerate(measure.find_contours(frequency, level)):
+                if len(contour) < 10:  # Skip very small contours
+                    continue
+                rows = np.clip(contour[:, 0].astype(int), 0, len(self.lat) - 1)
+                cols = np.clip(contour[:, 1].astype(int), 0, len(self.lon) - 1)
+                features.append(
+                    "LineString",
+                    np.column_stack((self.lon[cols], self.lat[rows])),
+                    feature_type="front_persistence",
+                    front_frequency=float(level),
+                    days=self.days,
+                    id=f"persistence_{level:g}_{i}"
+                )
+        return features if as_columns else features.to_geojson()
+
+    # ------------------------------------------------------------------
+    # Checkpointing
+    # ------------------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        """Write accumulators to an .npz file so long runs can resume"""
+        np.savez_compressed(
+            path, lon=self.lon, lat=self.lat, threshold=self.threshold, days=self.days,
+            observed=self.observed, front_count=self.front_count,
+            gradient_sum=self.gradient_sum, sst_mean=self.sst_mean, sst_m2=self.sst_m2
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "FrontClimatology":
+        """Restore accumulators written by save()"""
+        data = np.load(path)
+        clim = cls(data["lon"], data["lat"], float(data["threshold"]))
+        clim.days = int(data["days"])
+        for name in ("observed", "front_count", "gradient_sum", "sst_mean", "sst_m2"):
+            setattr(clim, name, data[name].copy())
+        return clim
+
+
+def aggregate_sst_climatology(dates: List, min_lon: float, max_lon: float,
+                              min_lat: float, max_lat: float,
+                              threshold: float = 0.5,
+                              max_pixels: Optional[int] = None) -> Optional[FrontClimatology]:
+    """
+    Stream daily CMEMS SST grids for a bbox through a FrontClimatology
+
+    Grids are fetched one day at a time and released after each update, and
+    they bypass the shared grid cache so a long range does not evict the
+    grids live map requests depend on. Only the few recent days that CMEMS
+    may still revise go through the cache, so the endpoint's ETag can name
+    the revision of those grids.
+
+    Args:
+        dates: Days (datetime) to aggregate
+        min_lon, max_lon: Longitude bounds
+        min_lat, max_lat: Latitude bounds
+        threshold: Front gradient threshold (°C/km)
+        max_pixels: Downsample each day to the pyramid level fitting this budget
+
+    Returns:
+        The filled climatology, or None if no day could be fetched
+    """
+    from app.copernicus_data import fetch_sst_data, get_sst_grid
+    from app.http_cache import is_recent
+    from app.pyramid import downsample_grid, level_for_max_pixels
+
+    clim = None
+    for day in dates:
+        fetch = get_sst_grid if is_recent(day) else fetch_sst_data
+        result = fetch(min_lon, max_lon, min_lat, max_lat, day)
+        if result is None:
+            logger.warning(f"Climatology: no SST for {day:%Y-%m-%d}, skipping")
+            continue
+        level = level_for_max_pixels(result[0].shape, max_pixels)
+        sst, lon, lat = downsample_grid(result, 2 ** level)
+
+        if clim is None:
+            clim = FrontClimatology(lon, lat, threshold)
+        try:
+            clim.update(np.asarray(sst, dtype=np.float32))
+        except ValueError as e:
+            logger.warning(f"Climatology: skipping {day:%Y-%m-%d}: {e}")
+    return clim
@@ -3,13 +3,20 @@ Copernicus Marine Data Fetcher
 Fetches REAL SST and Chlorophyll data from Copernicus Marine Service
 """
 
+import hashlib
 import os
+import threading
+import weakref
 import numpy as np
-import xarray as xr
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Callable, Dict, Optional, Tuple
 import logging
 
+from app.grid_cache import GridCache
+from app.masks import GridMask
+from app.shared_grids import SharedGridStore
+from app.pyramid import downsample_grid, level_for_max_pixels, level_for_resolution
+
 logger = logging.getLogger(__name__)
 
 # Copernicus Marine Service credentials from environment
@@ -93,6 +100,7 @@ def fetch_sst_data(
             # Fallback to xarray with OPeNDAP
             # Note: This requires pydap and proper authentication setup
             import pydap.client
+            import xarray as xr
 
             # Build subset URL
             url = f"{SST_OPENDAP_URL}?thetao[0:1:0][0:1:0][{min_lat}:{max_lat}][{min_lon}:{max_lon}]"
@@ -168,6 +176,243 @@ def fetch_chlorophyll_data(
         return None
 
 
+# Optional cross-process store (SHARED_GRID_STORE=1): one memory-mapped copy of
+# each grid for all workers instead of one per process
+shared_store = SharedGridStore.from_env()
+
+
+def _release_shared(key: tuple, grid) -> None:
+    """Drop this process's reference when the local cache evicts a grid"""
+    if shared_store is not None:
+        shared_store.release(key)
+
+
+# Fetched grids shared by every endpoint; daily products only change once a day
+grid_cache = GridCache(
+    max_entries=int(os.environ.get('GRID_CACHE_MAX_ENTRIES', 32)),
+    ttl_seconds=float(os.environ.get('GRID_CACHE_TTL_SECONDS', 6 * 3600)),
+    on_evict=_release_shared
+)
+
+
+def _cached_fetch(key: tuple, fetch):
+    """Look a grid up in the local cache, then the shared store, then fetch it"""
+    if shared_store is None:
+        return grid_cache.get_or_fetch(key, fetch)
+    return grid_cache.get_or_fetch(key, lambda: shared_store.get_or_fetch(key, fetch))
+
+
+def _grid_cache_key(
+    product: str,
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    date: Optional[datetime]
+) -> tuple:
+    """Build a cache key for a product/bbox/date request"""
+    if date is None:
+        date = datetime.now() - timedelta(days=1)
+    bbox = tuple(round(float(v), 4) for v in (min_lon, max_lon, min_lat, max_lat))
+    return (product, date.strftime("%Y-%m-%d")) + bbox
+
+
+def get_sst_grid(
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    date: Optional[datetime] = None
+) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Cache-backed wrapper around fetch_sst_data
+
+    Returns:
+        Tuple of (sst_array, lon_array, lat_array) or None if failed
+    """
+    key = _grid_cache_key(SST_PRODUCT, min_lon, max_lon, min_lat, max_lat, date)
+    return _cached_fetch(
+        key, lambda: fetch_sst_data(min_lon, max_lon, min_lat, max_lat, date)
+    )
+
+
+def get_chlorophyll_grid(
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    date: Optional[datetime] = None
+) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Cache-backed wrapper around fetch_chlorophyll_data
+
+    Returns:
+        Tuple of (chl_array, lon_array, lat_array) or None if failed
+    """
+    key = _grid_cache_key(CHL_PRODUCT, min_lon, max_lon, min_lat, max_lat, date)
+    return _cached_fetch(
+        key, lambda: fetch_chlorophyll_data(min_lon, max_lon, min_lat, max_lat, date)
+    )
+
+
+# Content hashes of cached native grids, keyed by cache key; weak references
+# to the hashed arrays tell when a key has been refetched
+_revisions: Dict[tuple, Tuple[weakref.ref, str]] = {}
+_revisions_lock = threading.Lock()
+
+
+def grid_revision(
+    product: str,
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    date: Optional[datetime] = None
+) -> Optional[str]:
+    """
+    Content hash of the cached native grid for a product/bbox/date
+
+    Identifies the data revision results were computed from, so HTTP
+    validators of recent days change when a refetch brings revised NRT data.
+    Never fetches.
+
+    Returns:
+        Short hex digest, or None if the grid is not in the local cache
+    """
+    key = _grid_cache_key(product, min_lon, max_lon, min_lat, max_lat, date)
+    grid = grid_cache.get(key)
+    if grid is None:
+        return None
+    data = grid[0]
+    with _revisions_lock:
+        entry = _revisions.get(key)
+        if entry is not None and entry[0]() is data:
+            return entry[1]
+
+    digest = hashlib.blake2b(np.ascontiguousarray(data).tobytes(), digest_size=8).hexdigest()
+    with _revisions_lock:
+        # Forget hashes of grids that have been evicted since
+        for stale in [k for k, (ref, _) in _revisions.items() if ref() is None]:
+            del _revisions[stale]
+        _revisions[key] = (weakref.ref(data), digest)
+    return digest
+
+
+def _pyramid_level(base, max_pixels: Optional[int], resolution_deg: Optional[float]) -> int:
+    """Coarsest level required by either the cell budget or the minimum pixel size"""
+    data, lon, lat = base
+    return max(
+        level_for_max_pixels(data.shape, max_pixels),
+        level_for_resolution(lon, lat, resolution_deg)
+    )
+
+
+def grid_level(
+    product: str,
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    date: Optional[datetime] = None,
+    max_pixels: Optional[int] = None,
+    resolution_deg: Optional[float] = None
+) -> Optional[int]:
+    """
+    Pyramid level get_grid_level would return, without building it
+
+    Returns:
+        The level, or None if the native grid could not be fetched
+    """
+    fetchers = {SST_PRODUCT: get_sst_grid, CHL_PRODUCT: get_chlorophyll_grid}
+    base = fetchers[product](min_lon, max_lon, min_lat, max_lat, date)
+    if base is None:
+        return None
+    return _pyramid_level(base, max_pixels, resolution_deg)
+
+
+def get_grid_level(
+    product: str,
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    date: Optional[datetime] = None,
+    max_pixels: Optional[int] = None,
+    resolution_deg: Optional[float] = None
+) -> Optional[Tuple[int, Tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+    """
+    Fetch a grid and return the pyramid level that fits the requested budget
+
+    Downsampled levels are block-mean reductions of the cached native grid and
+    are cached alongside it, so each level is computed once per product/day/bbox.
+
+    Args:
+        product: SST_PRODUCT or CHL_PRODUCT
+        min_lon, max_lon: Longitude bounds
+        min_lat, max_lat: Latitude bounds
+        date: Date to fetch (defaults to yesterday)
+        max_pixels: Maximum number of grid cells to run detection on
+        resolution_deg: Minimum pixel size in degrees
+
+    Returns:
+        Tuple of (level, (data_array, lon_array, lat_array)) or None if failed
+    """
+    fetchers = {SST_PRODUCT: get_sst_grid, CHL_PRODUCT: get_chlorophyll_grid}
+    base = fetchers[product](min_lon, max_lon, min_lat, max_lat, date)
+    if base is None:
+        return None
+
+    level = _pyramid_level(base, max_pixels, resolution_deg)
+    if level == 0:
+        return 0, base
+
+    key = _grid_cache_key(product, min_lon, max_lon, min_lat, max_lat, date) + ("level", level)
+    grid = _cached_fetch(key, lambda: downsample_grid(base, 2 ** level))
+    logger.info(f"Using pyramid level {level} for {product}: shape={grid[0].shape}")
+    return level, grid
+
+
+# Land masks are static per product grid and bbox, so they outlive daily grids
+mask_cache = GridCache(
+    max_entries=int(os.environ.get('MASK_CACHE_MAX_ENTRIES', 128)),
+    ttl_seconds=float(os.environ.get('MASK_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+)
+
+
+def get_land_mask(
+    product: str,
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    level: int,
+    grid: Tuple[np.ndarray, np.ndarray, np.ndarray]
+) -> GridMask:
+    """
+    Cached land/valid mask for a product grid, bbox and pyramid level
+
+    The mask is built from the first grid seen for the key and reused for
+    every later date. Both products are gap-free (model SST, L4 CHL), so NaN
+    means land; detectors still fall back to a per-grid mask if a day has
+    gaps the cached mask does not cover.
+    """
+    bbox = tuple(round(float(v), 4) for v in (min_lon, max_lon, min_lat, max_lat))
+    key = (product, "mask", level) + bbox
+    mask = mask_cache.get_or_fetch(key, lambda: GridMask.from_data(grid[0]))
+    if mask.valid.shape != grid[0].shape:
+        # Product grid changed under the same bbox; rebuild
+        mask = GridMask.from_data(grid[0])
+        mask_cache.put(key, mask)
+    return mask
+
+
+def get_grid_level_masked(
+    product: str,
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    date: Optional[datetime] = None,
+    max_pixels: Optional[int] = None,
+    resolution_deg: Optional[float] = None
+) -> Optional[Tuple[int, Tuple[np.ndarray, np.ndarray, np.ndarray], GridMask]]:
+    """
+    get_grid_level plus the cached land mask of the returned level
+
+    Returns:
+        Tuple of (level, (data_array, lon_array, lat_array), mask) or None if failed
+    """
+    result = get_grid_level(product, min_lon, max_lon, min_lat, max_lat, date, max_pixels, resolution_deg)
+    if result is None:
+        return None
+    level, grid = result
+    return level, grid, get_land_mask(product, min_lon, max_lon, min_lat, max_lat, level, grid)
+
+
 def convert_to_native_types(obj):
     """Convert numpy types to native Python types for JSON serialization"""
     if isinstance(obj, dict):
@@ -184,61 +429,216 @@ def convert_to_native_types(obj):
         return obj
 
 
-def generate_real_polygons_for_region(
+# Detector settings shared by /ocean-features/real, progressive streaming and
+# the historical backfill
+FRONT_THRESHOLD = 0.3
+EDDY_MIN_RADIUS_KM = 10
+
+
+def product_detectors(detector) -> Dict[str, Dict[str, Callable]]:
+    """
+    Per-product detector runners with the shared settings
+
+    Each runner takes (grid, mask) and returns FeatureColumns; keys match
+    the scheduler's cost model names.
+    """
+    return {
+        SST_PRODUCT: {
+            "thermal_fronts": lambda grid, mask: detector.detect_thermal_fronts(
+                *grid, threshold=FRONT_THRESHOLD, as_columns=True, mask=mask
+            ),
+            "eddies": lambda grid, mask: detector.detect_eddies(
+                *grid, min_radius_km=EDDY_MIN_RADIUS_KM, as_columns=True, mask=mask
+            ),
+        },
+        CHL_PRODUCT: {
+            "chlorophyll_edges": lambda grid, mask: detector.detect_chlorophyll_edges(
+                *grid, as_columns=True, mask=mask
+            ),
+            "blooms": lambda grid, mask: detector.detect_phytoplankton_blooms(
+                *grid, as_columns=True, mask=mask
+            ),
+        },
+    }
+
+
+def detect_features_on_grids(sst_grid=None, chl_grid=None, sst_mask=None, chl_mask=None,
+                             detector=None):
+    """
+    Run all detectors on already loaded grids into one columnar collection
+
+    Shared by the live endpoints and the historical backfill so both use the
+    same detector settings (those of product_detectors).
+
+    Args:
+        sst_grid: (sst_array, lon_array, lat_array) or None to skip SST detectors
+        chl_grid: (chl_array, lon_array, lat_array) or None to skip CHL detectors
+        sst_mask: Cached land mask of the SST grid (built from NaNs if omitted)
+        chl_mask: Cached land mask of the CHL grid (built from NaNs if omitted)
+        detector: Configured OceanFeatureDetector (OceanFeatureDetector.from_env() if omitted)
+
+    Returns:
+        FeatureColumns with fronts, eddies, chlorophyll edges and blooms
+    """
+    from app.ocean_features import OceanFeatureDetector
+    from app.feature_collection import FeatureColumns
+    from app.masks import resolve_mask
+
+    detector = detector or OceanFeatureDetector.from_env()
+    collections = []
+
+    if sst_grid is not None:
+        sst_mask = resolve_mask(sst_grid[0], sst_mask)
+        for name, run in product_detectors(detector)[SST_PRODUCT].items():
+            features = run(sst_grid, sst_mask)
+            collections.append(features)
+            logger.info(f"Detected {len(features)} {name}")
+
+    if chl_grid is not None:
+        chl, lon, lat = chl_grid
+        chl_mask = resolve_mask(chl, chl_mask)
+
+        # Edges and blooms share the blurred, log-normalized CHL image instead
+        # of going through the product_detectors runners (same default settings)
+        chl_blurred = detector.chlorophyll_blurred(chl, chl_mask)
+
+        # Detect chlorophyll edges
+        edges = detector.edges_from_blurred(chl_blurred, lon, lat, as_columns=True, mask=chl_mask)
+        collections.append(edges)
+        logger.info(f"Detected {len(edges)} chlorophyll edges")
+
+        # Segment phytoplankton blooms
+        blooms = detector.blooms_from_blurred(chl_blurred, chl, lon, lat, as_columns=True, mask=chl_mask)
+        collections.append(blooms)
+        logger.info(f"Detected {len(blooms)} phytoplankton blooms")
+
+    return FeatureColumns.concat(collections)
+
+
+def detect_real_features(
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    date: Optional[datetime] = None,
+    max_pixels: Optional[int] = None,
+    resolution_deg: Optional[float] = None,
+    detector=None
+):
+    """
+    Fetch SST/CHL grids and run all detectors into one columnar collection
+
+    Args:
+        min_lon, max_lon: Longitude bounds
+        min_lat, max_lat: Latitude bounds
+        date: Date to fetch (defaults to yesterday)
+        max_pixels: Run detection on the pyramid level with at most this many cells
+        resolution_deg: Run detection on a pyramid level at least this coarse
+        detector: Configured OceanFeatureDetector (from the environment if omitted)
+
+    Returns:
+        Tuple of (FeatureColumns, pyramid levels used per product)
+    """
+    levels = {}
+    sst_grid = chl_grid = sst_mask = chl_mask = None
+
+    # Fetch SST data
+    sst_result = get_grid_level_masked(
+        SST_PRODUCT, min_lon, max_lon, min_lat, max_lat, date, max_pixels, resolution_deg
+    )
+    if sst_result is not None:
+        levels["sst"], sst_grid, sst_mask = sst_result
+
+    # Fetch chlorophyll data
+    chl_result = get_grid_level_masked(
+        CHL_PRODUCT, min_lon, max_lon, min_lat, max_lat, date, max_pixels, resolution_deg
+    )
+    if chl_result is not None:
+        levels["chlorophyll"], chl_grid, chl_mask = chl_result
+
+    return detect_features_on_grids(sst_grid, chl_grid, sst_mask, chl_mask, detector), levels
+
+
+def load_netcdf_grid(
+    path: str, variable: str,
     min_lon: float, max_lon: float,
     min_lat: float, max_lat: float
-) -> dict:
+) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
     """
-    Generate REAL ocean feature polygons for a given region
+    Load a bbox from a local NetCDF file (e.g. an archived CMEMS download)
 
-    Fetches actual Copernicus data and runs scientific detection algorithms
+    Leading time/depth dimensions are reduced to their first index, matching
+    what fetch_sst_data/fetch_chlorophyll_data take from the live products.
 
     Args:
+        path: NetCDF file path
+        variable: Variable name ("thetao" for SST, "CHL" for chlorophyll)
         min_lon, max_lon: Longitude bounds
         min_lat, max_lat: Latitude bounds
 
     Returns:
-        GeoJSON FeatureCollection with real detected features
+        Tuple of (data_array, lon_array, lat_array) or None if failed
     """
-    from app.ocean_features import OceanFeatureDetector
+    import xarray as xr
 
-    detector = OceanFeatureDetector()
-    all_features = []
+    try:
+        with xr.open_dataset(path) as ds:
+            da = ds[variable]
+            lat_name = "latitude" if "latitude" in da.dims else "lat"
+            lon_name = "longitude" if "longitude" in da.dims else "lon"
+
+            # Reduce time/depth to the first slice
+            for dim in da.dims:
+                if dim not in (lat_name, lon_name):
+                    da = da.isel({dim: 0})
+
+            lats = da[lat_name].values
+            lat_slice = slice(min_lat, max_lat) if lats[0] <= lats[-1] else slice(max_lat, min_lat)
+            da = da.sel({lat_name: lat_slice, lon_name: slice(min_lon, max_lon)})
+            da = da.transpose(lat_name, lon_name)
+
+            return da.values, da[lon_name].values, da[lat_name].values
+    except Exception as e:
+        logger.error(f"Failed to load {variable} from {path}: {e}")
+        return None
 
-    # Fetch and process SST data
-    sst_result = fetch_sst_data(min_lon, max_lon, min_lat, max_lat)
-    if sst_result is not None:
-        sst, lon, lat = sst_result
 
-        # Detect thermal fronts
-        fronts = detector.detect_thermal_fronts(sst, lon, lat, threshold=0.3)
-        all_features.extend(fronts)
-        logger.info(f"Detected {len(fronts)} thermal fronts")
+def generate_real_polygons_for_region(
+    min_lon: float, max_lon: float,
+    min_lat: float, max_lat: float,
+    date: Optional[datetime] = None,
+    max_pixels: Optional[int] = None,
+    resolution_deg: Optional[float] = None,
+    detector=None
+) -> dict:
+    """
+    Generate REAL ocean feature polygons for a given region
 
-        # Detect eddies
-        eddies = detector.detect_eddies(sst, lon, lat, min_radius_km=10)
-        all_features.extend(eddies)
-        logger.info(f"Detected {len(eddies)} eddies")
+    Fetches actual Copernicus data and runs scientific detection algorithms
 
-    # Fetch and process chlorophyll data
-    chl_result = fetch_chlorophyll_data(min_lon, max_lon, min_lat, max_lat)
-    if chl_result is not None:
-        chl, lon, lat = chl_result
+    Args:
+        min_lon, max_lon: Longitude bounds
+        min_lat, max_lat: Latitude bounds
+        date: Date to fetch (defaults to yesterday)
+        max_pixels: Run detection on the pyramid level with at most this many cells
+        resolution_deg: Run detection on a pyramid level at least this coarse
+        detector: Configured OceanFeatureDetector (from the environment if omitted)
 
-        # Detect chlorophyll edges
-        edges = detector.detect_chlorophyll_edges(chl, lon, lat)
-        all_features.extend(edges)
-        logger.info(f"Detected {len(edges)} chlorophyll edges")
+    Returns:
+        GeoJSON FeatureCollection with real detected features
+    """
+    features, levels = detect_real_features(
+        min_lon, max_lon, min_lat, max_lat, date, max_pixels, resolution_deg, detector
+    )
 
-    # Convert all numpy types to native Python for JSON serialization
+    # Columnar output converts straight to native Python types for JSON
     result = {
         "type": "FeatureCollection",
-        "features": convert_to_native_types(all_features),
+        "features": features.to_geojson(),
         "properties": {
             "generated_at": datetime.now().isoformat(),
             "bbox": [float(min_lon), float(min_lat), float(max_lon), float(max_lat)],
             "data_source": "Copernicus Marine Service (CMEMS)",
-            "real_data": True
+            "real_data": True,
+            "pyramid_levels": levels
         }
     }
 
@@ -0,0 +1,219 @@
+"""
+Fake Copernicus Marine Client
+Local stand-in for `copernicusmarine.open_dataset` that serves synthetic
+SST/CHL NetCDF files with configurable latency, so /ocean-features/real and
+the other fetch paths can be exercised offline.
+
+Grids are deterministic per product, date and bbox: meandering fronts,
+a few warm/cold-core eddies, chlorophyll patches and a land corner (NaN).
+Each dataset is written to NetCDF once and reopened on later calls, like a
+cached subset download.
+
+Run the API against it (all uvicorn workers install the fake):
+    FAKE_CMEMS_LATENCY_MS=400 uvicorn app.fake_cmems:create_app --factory --workers 2
+
+Check that fetches succeed through the real fetch path:
+    python -m app.fake_cmems
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Grid spacing of the real products (degrees)
+PRODUCT_RESOLUTION_DEG = {
+    "thetao": 0.083,
+    "CHL": 4.0 / 111.0,
+}
+
+
+def _settings() -> dict:
+    env = os.environ.get
+    return {
+        "latency_ms": float(env("FAKE_CMEMS_LATENCY_MS", 250)),
+        "jitter_ms": float(env("FAKE_CMEMS_JITTER_MS", 100)),
+        "failure_rate": float(env("FAKE_CMEMS_FAILURE_RATE", 0)),
+        "directory": env("FAKE_CMEMS_DIR") or os.path.join(tempfile.gettempdir(), "fake-cmems"),
+    }
+
+
+def synthetic_field(variable: str, lon: np.ndarray, lat: np.ndarray, seed: int) -> np.ndarray:
+    """
+    Synthetic SST (°C) or CHL (mg/m³) on a lon/lat grid
+
+    Features are placed in geographic coordinates, so overlapping bboxes and
+    pyramid levels see consistent values.
+    """
+    rng = np.random.default_rng(seed)
+    xx, yy = np.meshgrid(lon.astype(np.float64), lat.astype(np.float64))
+
+    # Meandering fronts running south-west to north-east, repeating every 3°
+    meander = 0.4 * np.sin(yy * 2.5 + rng.uniform(0, 2 * np.pi))
+    front = np.tanh(np.sin((xx - 0.8 * yy + meander) * (2 * np.pi / 3.0)) / 0.15)
+
+    # Eddies on a fixed 1° lattice so they don't depend on the bbox
+    eddies = np.zeros_like(xx)
+    for cx in np.arange(np.floor(lon.min()), np.ceil(lon.max()) + 1):
+        for cy in np.arange(np.floor(lat.min()), np.ceil(lat.max()) + 1):
+            # SeedSequence entries must be non-negative: offset lon/lat first
+            cell = np.random.default_rng((seed, int((cx + 180) * 10), int((cy + 90) * 10)))
+            ex, ey = cx + cell.uniform(0, 1), cy + cell.uniform(0, 1)
+            radius = cell.uniform(0.15, 0.35)
+            sign = 1.0 if cell.uniform() < 0.5 else -1.0
+            eddies += sign * np.exp(-((xx - ex) ** 2 + (yy - ey) ** 2) / (2 * radius ** 2))
+
+    if variable == "thetao":
+        values = 18.0 + 4.0 * front + 2.0 * eddies - 0.3 * (yy - yy.mean())
+        values += rng.normal(0, 0.03, values.shape)
+    else:
+        log_chl = -0.5 - 0.6 * front - 0.3 * eddies
+        log_chl += 0.4 * np.sin(xx * 7.0) * np.cos(yy * 5.0)
+        values = 10 ** (log_chl + rng.normal(0, 0.02, log_chl.shape))
+
+    # Land in the north-west corner of every 2° tile that touches it
+    land = (np.mod(xx, 2.0) < 0.35) & (np.mod(yy, 2.0) > 1.6)
+    values[land] = np.nan
+    return values.astype(np.float32)
+
+
+def _dataset_path(directory: str, dataset_id: str, variable: str, bbox: Sequence[float], day: str) -> str:
+    key = repr((dataset_id, variable, tuple(round(float(v), 4) for v in bbox), day))
+    name = hashlib.sha1(key.encode()).hexdigest()[:20]
+    return os.path.join(directory, f"{variable}_{day}_{name}.nc")
+
+
+def _write_dataset(path: str, variable: str, bbox: Sequence[float], day: str) -> None:
+    import xarray as xr
+
+    min_lon, max_lon, min_lat, max_lat = bbox
+    step = PRODUCT_RESOLUTION_DEG[variable]
+    lon = np.arange(np.floor(min_lon / step) * step, max_lon + step / 2, step)
+    lat = np.arange(np.floor(min_lat / step) * step, max_lat + step / 2, step)
+    seed = int(datetime.strptime(day, "%Y-%m-%d").toordinal())
+    field = synthetic_field(variable, lon, lat, seed)
+
+    coords = {"time": [np.datetime64(day)], "latitude": lat, "longitude": lon}
+    if variable == "thetao":
+        coords["depth"] = [0.494]
+        data = xr.DataArray(field[None, None], dims=("time", "depth", "latitude", "longitude"), coords=coords)
+    else:
+        data = xr.DataArray(field[None], dims=("time", "latitude", "longitude"), coords=coords)
+
+    # Write to a private name, then rename so concurrent workers and fetch
+    # threads never read (or replace) a partial file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".tmp-")
+    os.close(fd)
+    try:
+        xr.Dataset({variable: data}).to_netcdf(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def open_dataset(dataset_id: str, variables: Optional[Sequence[str]] = None,
+                 minimum_longitude: float = -180, maximum_longitude: float = 180,
+                 minimum_latitude: float = -90, maximum_latitude: float = 90,
+                 start_datetime: Optional[str] = None, end_datetime: Optional[str] = None,
+                 **kwargs):
+    """
+    Drop-in for copernicusmarine.open_dataset
+
+    Sleeps for the configured latency (plus uniform jitter), optionally
+    fails at FAKE_CMEMS_FAILURE_RATE, then returns an xarray Dataset loaded
+    into memory from the synthetic NetCDF file for the request.
+    """
+    import xarray as xr
+
+    settings = _settings()
+    variable = (variables or ["thetao"])[0]
+    if variable not in PRODUCT_RESOLUTION_DEG:
+        raise ValueError(f"Fake CMEMS has no variable {variable}")
+    day = (start_datetime or datetime.now().strftime("%Y-%m-%d"))[:10]
+    bbox = (minimum_longitude, maximum_longitude, minimum_latitude, maximum_latitude)
+
+    rng = np.random.default_rng()
+    delay = settings["latency_ms"] + rng.uniform(0, settings["jitter_ms"])
+    time.sleep(max(delay, 0) / 1000)
+    if rng.uniform() < settings["failure_rate"]:
+        raise RuntimeError("Fake CMEMS: simulated upstream failure")
+
+    os.makedirs(settings["directory"], exist_ok=True)
+    path = _dataset_path(settings["directory"], dataset_id, variable, bbox, day)
+    if not os.path.exists(path):
+        _write_dataset(path, variable, bbox, day)
+    # Load eagerly so the file handle is closed before returning
+    return xr.load_dataset(path)
+
+
+def install() -> None:
+    """Register this module as `copernicusmarine` for the current process"""
+    fake = types.ModuleType("copernicusmarine")
+    fake.open_dataset = open_dataset
+    fake.__fake__ = True
+    sys.modules["copernicusmarine"] = fake
+    logger.info(f"Fake CMEMS installed: {_settings()}")
+
+
+def smoke_check(bboxes: Sequence[Tuple[float, float, float, float]]) -> Dict[str, Tuple[int, int]]:
+    """
+    Fetch every bbox through app.copernicus_data with the fake installed
+
+    The fetch functions log and return None on any error, so without this
+    check a broken fake only shows up as 503s in the load test.
+
+    Args:
+        bboxes: (south, west, north, east) boxes to fetch
+
+    Returns:
+        Grid shape per product and bbox
+
+    Raises:
+        AssertionError: if a fetch returns no grid or a grid without data
+    """
+    from app.copernicus_data import fetch_sst_data, fetch_chlorophyll_data
+
+    install()
+    overrides = {"FAKE_CMEMS_LATENCY_MS": "0", "FAKE_CMEMS_JITTER_MS": "0", "FAKE_CMEMS_FAILURE_RATE": "0"}
+    previous = {name: os.environ.get(name) for name in overrides}
+    os.environ.update(overrides)
+    shapes = {}
+    try:
+        day = datetime.now() - timedelta(days=1)
+        for south, west, north, east in bboxes:
+            for name, fetch in (("sst", fetch_sst_data), ("chlorophyll", fetch_chlorophyll_data)):
+                result = fetch(west, east, south, north, day)
+                label = f"{name} {south},{west},{north},{east}"
+                assert result is not None, f"fake CMEMS fetch failed: {label}"
+                assert np.isfinite(result[0]).any(), f"fake CMEMS grid has no data: {label}"
+                shapes[label] = result[0].shape
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return shapes
+
+
+def create_app():
+    """uvicorn --factory entry point: install the fake, then load the API"""
+    install()
+    from app.main import app
+    return app
+
+
+if __name__ == "__main__":
+    for label, shape in smoke_check([(38.0, -74.0, 39.0, -73.0), (-10.0, 5.0, -8.0, 7.0)]).items():
+        print(f"{label:<40} {shape}")
@@ -0,0 +1,360 @@
+"""
+Columnar Feature Collection
+Array-backed storage for detector output: one flat float32 coordinate buffer,
+an offsets array and typed property columns instead of a dict per feature.
+Conversion to GeoJSON, WKB, Arrow IPC (GeoArrow) or FlatGeobuf happens lazily.
+"""
+
+import json
+import struct
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+GEOMETRY_TYPES = ("LineString", "Polygon")
+_GEOMETRY_CODES = {name: code for code, name in enumerate(GEOMETRY_TYPES)}
+_WKB_TYPES = {"LineString": 2, "Polygon": 3}
+
+# Property column kinds and their numpy storage dtypes
+COLUMN_DTYPES = {
+    "float": np.float64,
+    "int": np.int64,
+    "str": object,
+    "float_list": object,  # Variable-length per-feature values, e.g. per-vertex
+}
+
+
+class FeatureColumns:
+    """
+    Columnar collection of single-part LineString/Polygon features
+
+    Features are appended by detectors while scanning contours; buffers are
+    concatenated on first read. Polygons hold a single (exterior) ring, which
+    is all the detectors produce. Property columns are declared up front as
+    {name: "float" | "int" | "str" | "float_list"} and keep insertion order, so
+    GeoJSON output has the same property order as the schema.
+    """
+
+    def __init__(self, schema: Dict[str, str]):
+        for name, kind in schema.items():
+            if kind not in COLUMN_DTYPES:
+                raise ValueError(f"Unknown column type for {name}: {kind}")
+        self.schema = dict(schema)
+
+        self._coord_chunks: List[np.ndarray] = []
+        self._lengths: List[int] = []
+        self._geometry_codes: List[int] = []
+        self._values: Dict[str, list] = {name: [] for name in self.schema}
+
+        self._coords: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._geometry_types: Optional[np.ndarray] = None
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self._valid: Optional[Dict[str, np.ndarray]] = None
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def append(self, geometry_type: str, coords: np.ndarray, **properties) -> None:
+        """
+        Append one feature
+
+        Args:
+            geometry_type: "LineString" or "Polygon" (ring must already be closed)
+            coords: (n, 2) array of [lon, lat] vertices
+            **properties: Values for schema columns; omitted columns are null
+        """
+        if geometry_type not in _GEOMETRY_CODES:
+            raise ValueError(f"Unsupported geometry type: {geometry_type}")
+        unknown = set(properties) - set(self.schema)
+        if unknown:
+            raise ValueError(f"Properties not in schema: {sorted(unknown)}")
+
+        coords = np.asarray(coords, dtype=np.float32).reshape(-1, 2)
+        self._invalidate()
+        self._coord_chunks.append(coords)
+        self._lengths.append(len(coords))
+        self._geometry_codes.append(_GEOMETRY_CODES[geometry_type])
+        for name in self.schema:
+            self._values[name].append(properties.get(name))
+
+    def _invalidate(self) -> None:
+        if self._coords is not None:
+            # Keep the already concatenated buffer as a single chunk
+            self._coord_chunks = [self._coords]
+            self._coords = None
+        self._offsets = None
+        self._geometry_types = None
+        self._columns = None
+        self._valid = None
+
+    def _finalize(self) -> None:
+        """Concatenate pending appends into contiguous buffers"""
+        if self._coords is not None:
+            return
+        if self._coord_chunks:
+            self._coords = np.ascontiguousarray(np.concatenate(self._coord_chunks), dtype=np.float32)
+        else:
+            self._coords = np.empty((0, 2), dtype=np.float32)
+        self._coord_chunks = []
+
+        self._offsets = np.zeros(len(self._lengths) + 1, dtype=np.int64)
+        np.cumsum(np.asarray(self._lengths, dtype=np.int64), out=self._offsets[1:])
+        self._geometry_types = np.asarray(self._geometry_codes, dtype=np.uint8)
+
+        self._columns = {}
+        self._valid = {}
+        for name, kind in self.schema.items():
+            raw = self._values[name]
+            valid = np.fromiter((v is not None for v in raw), dtype=bool, count=len(raw))
+            if kind == "str":
+                column = np.array(raw, dtype=object)
+            elif kind == "float_list":
+                # Fill element-wise so equal-length lists don't become a 2D array
+                column = np.empty(len(raw), dtype=object)
+                for i, v in enumerate(raw):
+                    column[i] = None if v is None else [float(x) for x in v]
+            else:
+                fill = 0 if kind == "int" else np.nan
+                column = np.array([fill if v is None else v for v in raw], dtype=COLUMN_DTYPES[kind])
+            self._columns[name] = column
+            self._valid[name] = valid
+
+    # ------------------------------------------------------------------
+    # Array access
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @property
+    def coords(self) -> np.ndarray:
+        """All vertices as a contiguous (n_vertices, 2) float32 array"""
+        self._finalize()
+        return self._coords
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """Vertex offsets; feature i spans coords[offsets[i]:offsets[i + 1]]"""
+        self._finalize()
+        return self._offsets
+
+    @property
+    def geometry_types(self) -> np.ndarray:
+        """Per-feature geometry codes (index into GEOMETRY_TYPES)"""
+        self._finalize()
+        return self._geometry_types
+
+    def column(self, name: str) -> np.ndarray:
+        """Typed values of a property column"""
+        self._finalize()
+        return self._columns[name]
+
+    def valid(self, name: str) -> np.ndarray:
+        """Boolean mask of non-null entries in a property column"""
+        self._finalize()
+        return self._valid[name]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the finalized buffers"""
+        self._finalize()
+        total = self._coords.nbytes + self._offsets.nbytes + self._geometry_types.nbytes
+        for name, column in self._columns.items():
+            total += column.nbytes + self._valid[name].nbytes
+        return total
+
+    @classmethod
+    def concat(cls, collections: Iterable["FeatureColumns"]) -> "FeatureColumns":
+        """Concatenate collections, taking the union of their schemas"""
+        collections = list(collections)
+        schema: Dict[str, str] = {}
+        for fc in collections:
+            for name, kind in fc.schema.items():
+                if schema.setdefault(name, kind) != kind:
+                    raise ValueError(f"Conflicting column types for {name}")
+
+        merged = cls(schema)
+        for fc in collections:
+            if not len(fc):
+                continue
+            fc._finalize()
+            merged._invalidate()
+            merged._coord_chunks.append(fc._coords)
+            merged._lengths.extend(np.diff(fc._offsets).tolist())
+            merged._geometry_codes.extend(fc._geometry_types.tolist())
+            for name in schema:
+                if name in fc.schema:
+                    column, valid = fc._columns[name], fc._valid[name]
+                    merged._values[name].extend(
+                        v if ok else None for v, ok in zip(column.tolist(), valid.tolist())
+                    )
+                else:
+                    merged._values[name].extend([None] * len(fc))
+        return merged
+
+    # ------------------------------------------------------------------
+    # Output formats
+    # ------------------------------------------------------------------
+
+    def _properties(self) -> List[Dict]:
+        self._finalize()
+        columns = [
+            (name, self._columns[name].tolist(), self._valid[name].tolist())
+            for name in self.schema
+        ]
+        return [
+            {name: values[i] for name, values, valid in columns if valid[i]}
+            for i in range(len(self))
+        ]
+
+    def to_geojson(self, precision: int = 6) -> List[Dict]:
+        """
+        Convert to a list of GeoJSON Feature dicts
+
+        Args:
+            precision: Decimal places kept for coordinates
+        """
+        self._finalize()
+        coords = np.round(self._coords.astype(np.float64), precision).tolist()
+        offsets = self._offsets.tolist()
+        types = self._geometry_types.tolist()
+
+        features = []
+        for i, properties in enumerate(self._properties()):
+            ring = coords[offsets[i]:offsets[i + 1]]
+            geometry_type = GEOMETRY_TYPES[types[i]]
+            features.append({
+                "type": "Feature",
+                "properties": properties,
+                "geometry": {
+                    "type": geometry_type,
+                    "coordinates": [ring] if geometry_type == "Polygon" else ring
+                }
+            })
+        return features
+
+    def to_wkb(self) -> List[bytes]:
+        """Encode each geometry as little-endian ISO WKB"""
+        self._finalize()
+        coords = self._coords.astype("<f8")
+        offsets = self._offsets
+        out = []
+        for i, code in enumerate(self._geometry_types.tolist()):
+            geometry_type = GEOMETRY_TYPES[code]
+            points = coords[offsets[i]:offsets[i + 1]]
+            header = struct.pack("<BI", 1, _WKB_TYPES[geometry_type])
+            if geometry_type == "Polygon":
+                header += struct.pack("<I", 1)
+            out.append(header + struct.pack("<I", len(points)) + points.tobytes())
+        return out
+
+    def to_arrow_table(self):
+        """
+        Convert to a pyarrow Table with a GeoArrow geometry column
+
+        Collections with a single geometry type use the native interleaved
+        GeoArrow encoding (list of fixed-size xy lists), which readers can map
+        without copying; mixed collections fall back to geoarrow.wkb.
+        """
+        import pyarrow as pa
+
+        self._finalize()
+        arrays = []
+        fields = []
+        for name, kind in self.schema.items():
+            arrow_type = {
+                "float": pa.float64(), "int": pa.int64(), "str": pa.string(),
+                "float_list": pa.list_(pa.float64())
+            }[kind]
+            mask = ~self._valid[name]
+            values = self._columns[name]
+            if kind in ("str", "float_list"):
+                values = [None if m else v for v, m in zip(values.tolist(), mask.tolist())]
+                arrays.append(pa.array(values, type=arrow_type))
+            else:
+                arrays.append(pa.array(values, type=arrow_type, mask=mask))
+            fields.append(pa.field(name, arrow_type))
+
+        unique_types = np.unique(self._geometry_types)
+        if len(unique_types) <= 1:
+            geometry_type = GEOMETRY_TYPES[int(unique_types[0])] if len(unique_types) else "LineString"
+            # Child fields carry the names the GeoArrow spec gives them
+            xy_type = pa.list_(pa.field("xy", pa.float64()), 2)
+            vertices_type = pa.list_(pa.field("vertices", xy_type))
+            xy = pa.FixedSizeListArray.from_arrays(
+                pa.array(self._coords.astype(np.float64).ravel(), type=pa.float64()), type=xy_type
+            )
+            vertices = pa.ListArray.from_arrays(
+                pa.array(self._offsets.astype(np.int32)), xy, type=vertices_type
+            )
+            if geometry_type == "Polygon":
+                rings = np.arange(len(self) + 1, dtype=np.int32)
+                geometry = pa.ListArray.from_arrays(
+                    pa.array(rings), vertices, type=pa.list_(pa.field("rings", vertices_type))
+                )
+                extension = "geoarrow.polygon"
+            else:
+                geometry = vertices
+                extension = "geoarrow.linestring"
+        else:
+            geometry = pa.array(self.to_wkb(), type=pa.binary())
+            extension = "geoarrow.wkb"
+
+        geometry_field = pa.field(
+            "geometry", geometry.type,
+            metadata={
+                b"ARROW:extension:name": extension.encode(),
+                b"ARROW:extension:metadata": b'{"crs":"OGC:CRS84"}'
+            }
+        )
+        return pa.Table.from_arrays([geometry] + arrays, schema=pa.schema([geometry_field] + fields))
+
+    def to_arrow_ipc(self, file_format: bool = False) -> bytes:
+        """Serialize to an Arrow IPC stream, or the random-access IPC file format"""
+        import pyarrow as pa
+
+        table = self.to_arrow_table()
+        sink = pa.BufferOutputStream()
+        new_writer = pa.ipc.new_file if file_format else pa.ipc.new_stream
+        with new_writer(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    def to_flatgeobuf(self) -> bytes:
+        """Serialize to FlatGeobuf via pyogrio (GDAL)"""
+        import os
+        import tempfile
+        from pyogrio.raw import write
+
+        self._finalize()
+        unique_types = np.unique(self._geometry_types)
+        geometry_type = GEOMETRY_TYPES[int(unique_types[0])] if len(unique_types) == 1 else "Unknown"
+
+        fields = list(self.schema)
+        field_data = []
+        for name in fields:
+            values = self._columns[name]
+            if self.schema[name] == "str":
+                values = np.array(
+                    [v if ok else None for v, ok in zip(values.tolist(), self._valid[name].tolist())],
+                    dtype=object
+                )
+            elif self.schema[name] == "float_list":
+                # FlatGeobuf has no list fields; store them as JSON text
+                values = np.array(
+                    [json.dumps(v) if ok else None for v, ok in zip(values.tolist(), self._valid[name].tolist())],
+                    dtype=object
+                )
+            field_data.append(values)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "features.fgb")
+            write(
+                path, np.array(self.to_wkb(), dtype=object), field_data, fields,
+                driver="FlatGeobuf", geometry_type=geometry_type, crs="EPSG:4326",
+                layer="features"
+            )
+            with open(path, "rb") as f:
+                return f.read()
@@ -0,0 +1,95 @@
+"""
+Feature Response Formats
+Content negotiation between GeoJSON, GeoArrow (Arrow IPC stream or file) and FlatGeobuf
+"""
+
+import json
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from app.feature_collection import FeatureColumns
+
+GEOJSON_MEDIA_TYPE = "application/geo+json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_MEDIA_TYPE = "application/vnd.apache.arrow.file"
+FLATGEOBUF_MEDIA_TYPE = "application/flatgeobuf"
+
+# Accept values mapped to the format they select
+_MEDIA_TYPES = {
+    "application/json": "geojson",
+    GEOJSON_MEDIA_TYPE: "geojson",
+    ARROW_MEDIA_TYPE: "arrow",
+    ARROW_FILE_MEDIA_TYPE: "arrow-file",
+    FLATGEOBUF_MEDIA_TYPE: "flatgeobuf",
+    "application/x-flatgeobuf": "flatgeobuf",
+}
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Pick a response format from an Accept header
+
+    Media types are ranked by q-value (ties keep header order); anything
+    unrecognised, wildcards or a missing header fall back to GeoJSON so
+    existing clients are unaffected.
+
+    Returns:
+        One of "geojson", "arrow", "arrow-file" or "flatgeobuf"
+    """
+    if not accept:
+        return "geojson"
+
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        pieces = [p.strip() for p in part.split(";")]
+        media_type = pieces[0].lower()
+        q = 1.0
+        for param in pieces[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in _MEDIA_TYPES and q > 0:
+            candidates.append((-q, position, _MEDIA_TYPES[media_type]))
+
+    if not candidates:
+        return "geojson"
+    return min(candidates)[2]
+
+
+def binary_feature_response(features: FeatureColumns, fmt: str, metadata: Dict) -> Response:
+    """
+    Encode features as an Arrow IPC stream/file or FlatGeobuf response
+
+    Collection metadata travels in the X-Feature-Metadata header since neither
+    binary format has a slot for the GeoJSON "metadata" member.
+
+    Raises:
+        HTTPException 406 if the optional encoder dependency is not installed
+    """
+    try:
+        if fmt == "arrow":
+            body, media_type = features.to_arrow_ipc(), ARROW_MEDIA_TYPE
+        elif fmt == "arrow-file":
+            body, media_type = features.to_arrow_ipc(file_format=True), ARROW_FILE_MEDIA_TYPE
+        elif fmt == "flatgeobuf":
+            body, media_type = features.to_flatgeobuf(), FLATGEOBUF_MEDIA_TYPE
+        else:
+            raise ValueError(f"Unsupported binary format: {fmt}")
+    except ImportError as e:
+        raise HTTPException(
+            status_code=406,
+            detail=f"{fmt} output not available on this server ({e.name} not installed)"
+        )
+
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={
+            "X-Feature-Metadata": json.dumps(metadata, separators=(",", ":")),
+            "Vary": "Accept"
+        }
+    )
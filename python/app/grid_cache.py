@@ -0,0 +1,108 @@
+"""
+Grid Cache
+In-process LRU cache for fetched Copernicus grids, shared by all endpoints
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+Grid = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class GridCache:
+    """Thread-safe LRU cache of (data, lon, lat) grids with a time-to-live"""
+
+    def __init__(self, max_entries: int = 32, ttl_seconds: float = 6 * 3600,
+                 on_evict: Optional[Callable[[Hashable, Grid], None]] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[Hashable, Tuple[float, Grid]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict = {}
+
+    def _evicted(self, key: Hashable, grid: Grid) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, grid)
+
+    def get(self, key: Hashable) -> Optional[Grid]:
+        """Return a cached grid, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, grid = entry
+            expired = time.monotonic() - stored_at > self.ttl_seconds
+            if expired:
+                del self._entries[key]
+            else:
+                self._entries.move_to_end(key)
+        if expired:
+            self._evicted(key, grid)
+            return None
+        return grid
+
+    def put(self, key: Hashable, grid: Grid) -> None:
+        """Store a grid, evicting the least recently used entries if full"""
+        data, lon, lat = grid
+        # Cached arrays are shared between requests, so freeze them
+        for array in (data, lon, lat):
+            if array.flags.writeable:
+                array.setflags(write=False)
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None and previous[1] is not grid:
+                evicted.append((key, previous[1]))
+            self._entries[key] = (time.monotonic(), grid)
+            while len(self._entries) > self.max_entries:
+                old_key, (_, old_grid) = self._entries.popitem(last=False)
+                evicted.append((old_key, old_grid))
+                logger.info(f"Evicted grid from cache: {old_key}")
+        for old_key, old_grid in evicted:
+            self._evicted(old_key, old_grid)
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Optional[Grid]]) -> Optional[Grid]:
+        """
+        Return the cached grid for key, calling fetch on a miss
+
+        Concurrent misses for the same key wait on a single fetch instead of
+        each hitting Copernicus. Failed fetches (None) are not cached.
+        """
+        grid = self.get(key)
+        if grid is not None:
+            return grid
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            grid = self.get(key)
+            if grid is not None:
+                return grid
+            grid = fetch()
+            if grid is not None:
+                self.put(key, grid)
+
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return grid
+
+    def clear(self) -> None:
+        """Drop all cached grids"""
+        with self._lock:
+            entries = list(self._entries.items())
+            self._entries.clear()
+        for key, (_, grid) in entries:
+            self._evicted(key, grid)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
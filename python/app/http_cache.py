@@ -0,0 +1,156 @@
+"""
+HTTP Caching
+Deterministic validators for the /ocean-features/* GET endpoints. Results
+depend only on the CMEMS product, data date, bbox and detector parameters
+plus, for recent days that CMEMS may still revise, the revision of the
+grids they were computed from, so conditional requests are answered with
+304 before any detection runs. Recent days are revalidated by ETag only.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Bump (or set FEATURE_CACHE_VERSION) when detector output changes for the
+# same inputs so clients and CDNs drop results computed by older code
+CACHE_VERSION = os.environ.get("FEATURE_CACHE_VERSION", "1")
+
+# Daily NRT products can still be revised shortly after release; older days
+# are treated as final
+RECENT_MAX_AGE_SECONDS = int(os.environ.get("FEATURE_CACHE_MAX_AGE", 3600))
+ARCHIVE_MAX_AGE_SECONDS = int(os.environ.get("FEATURE_CACHE_ARCHIVE_MAX_AGE", 7 * 24 * 3600))
+ARCHIVE_AFTER_DAYS = 3
+
+
+def _canonical(value):
+    """JSON-stable form of a parameter value (floats rounded like grid cache keys)"""
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def is_recent(day: datetime, now: Optional[datetime] = None) -> bool:
+    """Whether a data date is young enough for its NRT product to be revised"""
+    now = now or datetime.now(timezone.utc)
+    return (now.date() - day.date()).days <= ARCHIVE_AFTER_DAYS
+
+
+def feature_etag(endpoint: str, products: Sequence[str], dates: Sequence[datetime],
+                 bbox: Tuple[float, float, float, float], params: Dict,
+                 fmt: str = "geojson", revision: str = "") -> str:
+    """
+    Strong ETag for a feature response
+
+    Args:
+        endpoint: Route identifier (e.g. "fronts")
+        products: CMEMS product IDs the response is computed from
+        dates: Data date(s) the response covers
+        bbox: (south, west, north, east)
+        params: Detector/pyramid parameters that change the output
+        fmt: Negotiated response format
+        revision: Identity of the source grids of recent days ("" for archived days)
+    """
+    key = {
+        "v": CACHE_VERSION,
+        "endpoint": endpoint,
+        "products": sorted(products),
+        "dates": [d.strftime("%Y-%m-%d") for d in dates],
+        "bbox": [round(float(v), 4) for v in bbox],
+        "params": {name: _canonical(value) for name, value in sorted(params.items())},
+        "format": fmt,
+        "revision": revision,
+    }
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def last_modified(day: datetime, now: Optional[datetime] = None) -> datetime:
+    """
+    Nominal release time of a daily product: 00:00 UTC the day after its data
+    date, capped at the current time
+    """
+    now = now or datetime.now(timezone.utc)
+    released = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(days=1)
+    return min(released, now.replace(microsecond=0))
+
+
+def cache_headers(etag: str, last_day: datetime, vary_accept: bool = False,
+                  now: Optional[datetime] = None) -> Dict[str, str]:
+    """
+    ETag, Last-Modified and Cache-Control for a response covering data up to last_day
+
+    Days older than ARCHIVE_AFTER_DAYS get the long archive max-age; recent
+    days are revalidated hourly since NRT products may still be updated (their
+    ETag names the grid revision, so a revised day no longer matches).
+    """
+    now = now or datetime.now(timezone.utc)
+    max_age = RECENT_MAX_AGE_SECONDS if is_recent(last_day, now) else ARCHIVE_MAX_AGE_SECONDS
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified(last_day, now), usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age}",
+    }
+    if vary_accept:
+        headers["Vary"] = "Accept"
+    return headers
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match list against our ETag"""
+    if if_none_match.strip() == "*":
+        return True
+    ours = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == ours:
+            return True
+    return False
+
+
+def not_modified(request: Request, headers: Dict[str, str],
+                 etag_only: bool = False) -> Optional[Response]:
+    """
+    Answer a conditional GET from its validators alone
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2).
+
+    Args:
+        request: Incoming request
+        headers: Cache headers of the current result
+        etag_only: Ignore If-Modified-Since. Set for recent days: Last-Modified
+            is the nominal release time and does not move when CMEMS revises
+            the grid, so only the ETag tells revisions apart.
+
+    Returns:
+        A 304 response carrying the cache headers, or None to compute the result
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        matched = _etag_matches(if_none_match, headers["ETag"])
+    elif etag_only:
+        return None
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None:
+            return None
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        matched = parsedate_to_datetime(headers["Last-Modified"]) <= since
+
+    if not matched:
+        return None
+    return Response(status_code=304, headers=headers)
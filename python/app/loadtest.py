@@ -0,0 +1,498 @@
+"""
+Load Test
+Offline end-to-end load test: starts the API under uvicorn with the fake
+CMEMS backend (app.fake_cmems), replays a weighted mix of detector POSTs on
+synthetic grids and bbox GETs at a target request rate, and reports
+throughput, latency percentiles and worker memory.
+
+Arrivals are open-loop: request i is due at a fixed offset from the start
+whether or not earlier requests have finished, and latency is measured from
+that due time, so a saturated server shows up as growing latency instead of
+a silently lower request rate.
+
+Usage:
+    python -m app.loadtest --rps 20 --duration 60 --workers 2 --latency-ms 400
+
+    # Against an already running server (memory from its process tree)
+    python -m app.loadtest --url http://localhost:8010 --server-pid 1234 \\
+        --mix get-real=4,get-fronts=2,post-fronts-256=1 --json report.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Regions the bbox GETs are drawn from: (name, south, west, size in degrees).
+# Offsets are snapped to half degrees so repeated bboxes hit the grid cache.
+REGIONS = [
+    ("small", 38.0, -74.0, 1.0),
+    ("medium", 36.0, -75.0, 3.0),
+    ("large", 32.0, -78.0, 8.0),
+]
+
+DEFAULT_MIX = {
+    "post-fronts-64": 3,
+    "post-fronts-256": 2,
+    "post-fronts-512": 1,
+    "post-edges-256": 1,
+    "post-blooms-256": 1,
+    "post-eddies-256": 1,
+    "get-real": 3,
+    "get-fronts": 2,
+    "get-edges": 1,
+    "get-eddies": 1,
+}
+
+POST_ENDPOINTS = {
+    "fronts": ("/api/features/thermal-fronts", "sst"),
+    "edges": ("/api/features/chlorophyll-edges", "chl"),
+    "blooms": ("/api/features/phytoplankton-blooms", "chl"),
+    "eddies": ("/api/features/eddies", "sst"),
+}
+
+GET_ENDPOINTS = {
+    "real": "/ocean-features/real",
+    "fronts": "/ocean-features/fronts",
+    "edges": "/ocean-features/edges",
+    "eddies": "/ocean-features/eddies",
+}
+
+# (method, path with query, body, headers)
+RequestSpec = Tuple[str, str, Optional[bytes], Dict[str, str]]
+
+
+@dataclass
+class Scenario:
+    """One kind of request in the traffic mix"""
+    name: str
+    weight: float
+    build: Callable[[random.Random], RequestSpec]
+
+
+@dataclass
+class Sample:
+    """Outcome of one request"""
+    scenario: str
+    status: str
+    latency: float
+    bytes: int
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse 'name=weight,name=weight'"""
+    mix = {}
+    try:
+        for item in spec.split(","):
+            name, weight = item.split("=", 1)
+            mix[name.strip()] = float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Invalid mix '{spec}'. Expected: name=weight,name=weight"
+        )
+    return mix
+
+
+def _post_body(kind: str, size: int) -> bytes:
+    """JSON body of a detector POST on a synthetic grid of size x size"""
+    from app.warmup import synthetic_grid
+
+    sst, chl, lon, lat = synthetic_grid(size)
+    data = sst if POST_ENDPOINTS[kind][1] == "sst" else chl
+    return json.dumps({
+        "data": data.round(4).tolist(),
+        "lon": lon.round(4).tolist(),
+        "lat": lat.round(4).tolist(),
+    }).encode()
+
+
+def build_scenarios(mix: Dict[str, float], days: int, revalidate: float,
+                    etags: Dict[str, str]) -> List[Scenario]:
+    """
+    Scenarios of the mix
+
+    Names are post-<fronts|edges|blooms|eddies>-<grid size> or
+    get-<real|fronts|edges|eddies>. A `revalidate` fraction of GETs repeat
+    the ETag last seen for the same URL in If-None-Match.
+    """
+    last_day = datetime.now() - timedelta(days=1)
+    dates = [(last_day - timedelta(days=d)).strftime("%Y-%m-%d") for d in range(max(days, 1))]
+    scenarios = []
+
+    for name, weight in mix.items():
+        parts = name.split("-")
+        if len(parts) == 3 and parts[0] == "post" and parts[1] in POST_ENDPOINTS and parts[2].isdigit():
+            path = POST_ENDPOINTS[parts[1]][0]
+            body = _post_body(parts[1], int(parts[2]))
+            headers = {"Content-Type": "application/json"}
+
+            def build(rng: random.Random, spec: RequestSpec = ("POST", path, body, headers)) -> RequestSpec:
+                return spec
+        elif len(parts) == 2 and parts[0] == "get" and parts[1] in GET_ENDPOINTS:
+            def build(rng: random.Random, path: str = GET_ENDPOINTS[parts[1]]) -> RequestSpec:
+                _, south, west, size = rng.choice(REGIONS)
+                south += rng.randrange(0, 5) * 0.5
+                west += rng.randrange(0, 5) * 0.5
+                url = f"{path}?bbox={south},{west},{south + size},{west + size}&date={rng.choice(dates)}"
+                headers = {}
+                if url in etags and rng.random() < revalidate:
+                    headers["If-None-Match"] = etags[url]
+                return "GET", url, None, headers
+        else:
+            raise ValueError(f"Unknown scenario '{name}'")
+        scenarios.append(Scenario(name, weight, build))
+    return scenarios
+
+
+def arrival_offsets(rps: float, duration: float, poisson: bool, rng: random.Random) -> List[float]:
+    """Due times (seconds from start) of every request"""
+    if not poisson:
+        return [i / rps for i in range(int(rps * duration))]
+    offsets, t = [], rng.expovariate(rps)
+    while t < duration:
+        offsets.append(t)
+        t += rng.expovariate(rps)
+    return offsets
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return float("nan")
+    rank = max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    summary = {f"p{q}": percentile(values, q) * 1000 for q in (50, 95, 99)}
+    summary["max"] = values[-1] * 1000 if values else float("nan")
+    summary["mean"] = sum(values) / len(values) * 1000 if values else float("nan")
+    return {k: round(v, 1) for k, v in summary.items()}
+
+
+def process_tree(root: int) -> List[int]:
+    """root and all of its descendants (Linux /proc)"""
+    children = defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the parenthesised command name: state, ppid, ...
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children[ppid].append(int(entry))
+
+    pids, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process in MB, None once it has exited"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class MemorySampler(threading.Thread):
+    """Samples RSS of a server's process tree until stopped"""
+
+    def __init__(self, root_pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak: Dict[int, float] = {}
+        self.last: Dict[int, float] = {}
+        self.peak_total = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def sample(self):
+        total = 0.0
+        for pid in process_tree(self.root_pid):
+            rss = rss_mb(pid)
+            if rss is None:
+                continue
+            self.last[pid] = rss
+            self.peak[pid] = max(self.peak.get(pid, 0.0), rss)
+            total += rss
+        self.peak_total = max(self.peak_total, total)
+
+    def stop(self) -> Dict:
+        self._stop_event.set()
+        self.join()
+        return {
+            "processes": {
+                str(pid): {"peak_mb": round(self.peak[pid], 1), "last_mb": round(self.last[pid], 1)}
+                for pid in sorted(self.peak)
+            },
+            "peak_total_mb": round(self.peak_total, 1),
+        }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, latency_ms: float, jitter_ms: float, failure_rate: float,
+                 startup_timeout: float = 120) -> Tuple[subprocess.Popen, str]:
+    """
+    Launch uvicorn with the fake CMEMS backend and wait for /health
+
+    Returns:
+        (process, base URL)
+    """
+    import requests
+
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "FAKE_CMEMS_LATENCY_MS": str(latency_ms),
+        "FAKE_CMEMS_JITTER_MS": str(jitter_ms),
+        "FAKE_CMEMS_FAILURE_RATE": str(failure_rate),
+    })
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.fake_cmems:create_app", "--factory",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {process.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=2).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+
+    stop_server(process)
+    raise RuntimeError(f"Server did not become healthy within {startup_timeout}s")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_load(url: str, scenarios: List[Scenario], rps: float, duration: float, warmup: float,
+             poisson: bool, concurrency: int, timeout: float, etags: Dict[str, str],
+             seed: int = 0) -> Tuple[List[Sample], float]:
+    """
+    Replay the mix against url
+
+    Requests due during the first `warmup` seconds are sent but not recorded.
+
+    Returns:
+        (samples of the measured period, its wall time in seconds)
+    """
+    import requests
+
+    rng = random.Random(seed)
+    offsets = arrival_offsets(rps, warmup + duration, poisson, rng)
+    weights = [s.weight for s in scenarios]
+    local = threading.local()
+    samples: List[Sample] = []
+    lock = threading.Lock()
+
+    def send(scenario: Scenario, spec: RequestSpec, due: float, record: bool) -> None:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        method, path, body, headers = spec
+        size = 0
+        try:
+            response = local.session.request(method, url + path, data=body, headers=headers, timeout=timeout)
+            status = str(response.status_code)
+            size = len(response.content)
+            if method == "GET" and "ETag" in response.headers:
+                etags[path] = response.headers["ETag"]
+        except requests.RequestException as e:
+            status = f"error:{type(e).__name__}"
+        latency = time.perf_counter() - due
+        if record:
+            with lock:
+                samples.append(Sample(scenario.name, status, latency, size))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        for offset in offsets:
+            scenario = rng.choices(scenarios, weights)[0]
+            spec = scenario.build(rng)
+            due = start + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, scenario, spec, due, offset >= warmup)
+    elapsed = time.perf_counter() - start - warmup
+    return samples, max(elapsed, 1e-9)
+
+
+def build_report(samples: List[Sample], elapsed: float, rps: float) -> Dict:
+    """Throughput, latency percentiles (ms) and status counts, overall and per scenario"""
+    def summarize(group: List[Sample]) -> Dict:
+        ok = [s for s in group if s.status in ("200", "304")]
+        return {
+            "requests": len(group),
+            "throughput_rps": round(len(ok) / elapsed, 2),
+            "error_rate": round(1 - len(ok) / len(group), 4) if group else 0.0,
+            "latency_ms": latency_summary([s.latency for s in group]),
+            "status": dict(Counter(s.status for s in group)),
+            "mean_response_kb": round(sum(s.bytes for s in group) / max(len(group), 1) / 1024, 1),
+        }
+
+    by_scenario = defaultdict(list)
+    for sample in samples:
+        by_scenario[sample.scenario].append(sample)
+
+    report = {"offered_rps": rps, "elapsed_seconds": round(elapsed, 2)}
+    report.update(summarize(samples))
+    report["scenarios"] = {name: summarize(group) for name, group in sorted(by_scenario.items())}
+    return report
+
+
+def print_report(report: Dict) -> None:
+    def row(name: str, r: Dict) -> str:
+        lat = r["latency_ms"]
+        return (f"{name:<18} {r['requests']:>7} {r['throughput_rps']:>8.2f} {r['error_rate'] * 100:>6.1f}% "
+                f"{lat['p50']:>9.1f} {lat['p95']:>9.1f} {lat['p99']:>9.1f}")
+
+    print(f"{'scenario':<18} {'reqs':>7} {'ok/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, scenario in report["scenarios"].items():
+        print(row(name, scenario))
+    print(row("total", report))
+    print(f"offered {report['offered_rps']} rps over {report['elapsed_seconds']}s, status {report['status']}")
+
+    memory = report.get("memory")
+    if memory:
+        for pid, rss in memory["processes"].items():
+            print(f"pid {pid:>7}: peak {rss['peak_mb']:8.1f} MB  last {rss['last_mb']:8.1f} MB")
+        print(f"server tree peak {memory['peak_total_mb']:.1f} MB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test of the ocean features API")
+    parser.add_argument("--url", help="Base URL of a running server (default: start one with fake CMEMS)")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, to sample its memory")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn workers of the started server")
+    parser.add_argument("--latency-ms", type=float, default=250, help="Fake CMEMS base latency")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="Fake CMEMS uniform latency jitter")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of fake CMEMS fetches that fail")
+    parser.add_argument("--rps", type=float, default=10, help="Target request rate")
+    parser.add_argument("--duration", type=float, default=60, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=10, help="Unrecorded seconds before measuring")
+    parser.add_argument("--poisson", action="store_true", help="Poisson instead of evenly spaced arrivals")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Scenario weights as name=weight,... (e.g. post-fronts-512=1,get-real=3)")
+    parser.add_argument("--days", type=int, default=3, help="Distinct recent dates used by GETs")
+    parser.add_argument("--revalidate", type=float, default=0.2,
+                        help="Fraction of repeated GETs sent with If-None-Match")
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum in-flight requests")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout (seconds)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="Exit non-zero if overall p99 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="Exit non-zero if the error rate exceeds this")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    etags: Dict[str, str] = {}
+    try:
+        scenarios = build_scenarios(args.mix, args.days, args.revalidate, etags)
+    except ValueError as e:
+        parser.error(str(e))
+
+    process = None
+    url, server_pid = args.url, args.server_pid
+    if url is None:
+        from app.fake_cmems import smoke_check
+
+        # Fail fast if the fake cannot serve the regions the GETs will ask for
+        smoke_check([
+            (south, west, south + size + 2.0, west + size + 2.0)
+            for _, south, west, size in REGIONS
+        ])
+        process, url = start_server(args.workers, args.latency_ms, args.jitter_ms, args.failure_rate)
+        server_pid = process.pid
+        logger.info(f"Started server {url} (pid {server_pid}, {args.workers} workers, fake CMEMS)")
+    url = url.rstrip("/")
+
+    sampler = None
+    if server_pid is not None and os.path.isdir("/proc"):
+        sampler = MemorySampler(server_pid)
+        sampler.start()
+
+    try:
+        samples, elapsed = run_load(
+            url, scenarios, args.rps, args.duration, args.warmup, args.poisson,
+            args.concurrency, args.timeout, etags, args.seed
+        )
+        report = build_report(samples, elapsed, args.rps)
+        if sampler is not None:
+            report["memory"] = sampler.stop()
+        try:
+            import requests
+            report["scheduler"] = requests.get(f"{url}/api/scheduler", timeout=10).json()
+        except Exception as e:
+            logger.warning(f"Could not read scheduler stats: {e}")
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    report["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = (
+        (args.max_p99_ms is not None and not report["latency_ms"]["p99"] <= args.max_p99_ms)
+        or (args.max_error_rate is not None and report["error_rate"] > args.max_error_rate)
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
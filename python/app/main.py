@@ -1,16 +1,26 @@
 """
 FastAPI server for ocean feature detection
-Exposes SST fronts, chlorophyll edges, and eddy detection endpoints
+Exposes SST fronts, chlorophyll edges, eddy and phytoplankton bloom detection endpoints
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import json
+import os
 import numpy as np
 import logging
 
-from app.ocean_features import OceanFeatureDetector
+from app.ocean_features import OceanFeatureDetector, FRONT_MODES
+from app.sessions import GridSession, SessionStore, SessionTooLarge
+from app.pyramid import GridPyramid
+from app.formats import negotiate_format, binary_feature_response
+from app.scheduler import DetectionScheduler, bbox_pixels, budgeted_pixels, SST_RESOLUTION_DEG, CHL_RESOLUTION_DEG
+from app.http_cache import feature_etag, cache_headers, not_modified, is_recent
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -38,8 +48,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize detector
-detector = OceanFeatureDetector()
+# Initialize detector (OKUBO_WEISS_KERNEL=reference selects the np.gradient implementation)
+detector = OceanFeatureDetector.from_env()
+
+# Server-side grid sessions for incremental threshold changes. Sessions are
+# per-process: use one worker or session-affine routing (see app.sessions)
+sessions = SessionStore.from_env()
+
+# Cost-aware admission control and interactive/batch lanes for detector work
+scheduler = DetectionScheduler.from_env()
 
 # Pydantic models for request/response
 class OceanDataRequest(BaseModel):
@@ -47,6 +64,8 @@ class OceanDataRequest(BaseModel):
     data: List[List[float]] = Field(..., description="2D array of ocean data (SST or chlorophyll)")
     lon: List[float] = Field(..., description="1D array of longitude coordinates")
     lat: List[float] = Field(..., description="1D array of latitude coordinates")
+    max_pixels: Optional[int] = Field(None, description="Run detection on a downsampled pyramid level with at most this many cells")
+    resolution: Optional[float] = Field(None, description="Run detection on a pyramid level with pixels at least this size (degrees)")
 
     class Config:
         json_schema_extra = {
@@ -60,16 +79,27 @@ class OceanDataRequest(BaseModel):
 class ThermalFrontsRequest(OceanDataRequest):
     """Request model for thermal front detection"""
     threshold: Optional[float] = Field(0.5, description="Temperature gradient threshold (°C/km)")
+    mode: Optional[str] = Field("contour", description="Front geometry: 'contour' (outlines) or 'centerline' (skeleton polylines with per-vertex strength)")
 
 class ChlorophyllEdgesRequest(OceanDataRequest):
     """Request model for chlorophyll edge detection"""
     low_thresh: Optional[float] = Field(0.1, description="Lower threshold for Canny detection")
     high_thresh: Optional[float] = Field(0.3, description="Upper threshold for Canny detection")
 
+class BloomSegmentationRequest(ChlorophyllEdgesRequest):
+    """Request model for phytoplankton bloom segmentation"""
+    min_area: Optional[int] = Field(100, description="Minimum bloom size in pixels")
+
 class EddyDetectionRequest(OceanDataRequest):
     """Request model for eddy detection"""
     min_radius_km: Optional[float] = Field(10.0, description="Minimum eddy radius in kilometers")
 
+class FetchSessionRequest(BaseModel):
+    """Request model for creating a session from Copernicus data"""
+    product: str = Field(..., description="Product to fetch: 'sst' or 'chlorophyll'")
+    bbox: str = Field(..., description="Bounding box as 'south,west,north,east'")
+    date: Optional[str] = Field(None, description="Date in ISO format YYYY-MM-DD (defaults to yesterday)")
+
 class GeoJSONFeatureCollection(BaseModel):
     """GeoJSON FeatureCollection response"""
     type: str = "FeatureCollection"
@@ -87,17 +117,52 @@ async def root():
         "endpoints": {
             "thermal_fronts": "/api/features/thermal-fronts",
             "chlorophyll_edges": "/api/features/chlorophyll-edges",
-            "eddies": "/api/features/eddies"
+            "eddies": "/api/features/eddies",
+            "phytoplankton_blooms": "/api/features/phytoplankton-blooms",
+            "sessions": "/api/sessions",
+            "progressive": "/ocean-features/progressive"
         }
     }
 
+@app.on_event("startup")
+async def warm_up_detectors():
+    """Preload heavy imports and run each detector once (disable with WARMUP=0)"""
+    from app.warmup import warm_up
+
+    if os.environ.get("WARMUP", "1").lower() in ("0", "false", "no"):
+        return
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, warm_up, detector)
+    except Exception as e:
+        logger.warning(f"Detector warm-up failed: {e}")
+
+@app.on_event("startup")
+async def calibrate_scheduler():
+    """Fit detector cost models on this machine when CALIBRATE_COST_MODELS=1"""
+    if os.environ.get("CALIBRATE_COST_MODELS", "").lower() in ("1", "true", "yes"):
+        await asyncio.get_running_loop().run_in_executor(None, scheduler.calibrate)
+
+@app.on_event("startup")
+async def sweep_shared_grids():
+    """Clear grids leaked by crashed workers from the shared grid store"""
+    from app.copernicus_data import shared_store
+
+    if shared_store is not None:
+        removed = shared_store.sweep()
+        logger.info(f"Shared grid store at {shared_store.root}: swept {removed} stale grids")
+
 @app.get("/health")
 async def health_check():
     """Health check for container orchestration"""
     return {"status": "healthy"}
 
+@app.get("/api/scheduler")
+async def scheduler_stats():
+    """Scheduler lane counters and cost models"""
+    return scheduler.stats()
+
 @app.post("/api/features/thermal-fronts", response_model=GeoJSONFeatureCollection)
-async def detect_thermal_fronts(request: ThermalFrontsRequest):
+async def detect_thermal_fronts(request: ThermalFrontsRequest, http_request: Request):
     """
     Detect SST thermal fronts using Sobel edge detection
 
@@ -105,7 +170,8 @@ async def detect_thermal_fronts(request: ThermalFrontsRequest):
         request: ThermalFrontsRequest containing SST data and coordinates
 
     Returns:
-        GeoJSON FeatureCollection of thermal front LineStrings
+        GeoJSON FeatureCollection of thermal front LineStrings, or an Arrow IPC /
+        FlatGeobuf body when requested via the Accept header
     """
     try:
         # Convert lists to numpy arrays
@@ -120,27 +186,44 @@ async def detect_thermal_fronts(request: ThermalFrontsRequest):
                 detail=f"Data dimensions mismatch: data shape {sst_array.shape}, lat length {len(lat_array)}, lon length {len(lon_array)}"
             )
 
-        logger.info(f"Detecting thermal fronts with threshold={request.threshold}")
+        # Coarsen large grids to the requested pyramid level
+        level, (sst_array, lon_array, lat_array) = GridPyramid(sst_array, lon_array, lat_array).select(
+            request.max_pixels, request.resolution
+        )
+
+        logger.info(f"Detecting thermal fronts with threshold={request.threshold}, mode={request.mode}")
 
         # Detect fronts
-        features = detector.detect_thermal_fronts(
-            sst_array=sst_array,
-            lon_array=lon_array,
-            lat_array=lat_array,
-            threshold=request.threshold
+        features = await scheduler.run(
+            "thermal_fronts", sst_array.shape,
+            lambda: detector.detect_thermal_fronts(
+                sst_array=sst_array,
+                lon_array=lon_array,
+                lat_array=lat_array,
+                threshold=request.threshold,
+                as_columns=True,
+                mode=request.mode
+            )
         )
 
         logger.info(f"Detected {len(features)} thermal fronts")
 
-        return GeoJSONFeatureCollection(
-            features=features,
-            metadata={
-                "feature_count": len(features),
-                "threshold": request.threshold,
-                "data_shape": list(sst_array.shape)
-            }
-        )
+        metadata = {
+            "feature_count": len(features),
+            "threshold": request.threshold,
+            "mode": request.mode,
+            "data_shape": list(sst_array.shape),
+            "pyramid_level": level
+        }
+
+        fmt = negotiate_format(http_request.headers.get("accept"))
+        if fmt != "geojson":
+            return binary_feature_response(features, fmt, metadata)
+
+        return GeoJSONFeatureCollection(features=features.to_geojson(), metadata=metadata)
 
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Value error in thermal front detection: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -149,7 +232,7 @@ async def detect_thermal_fronts(request: ThermalFrontsRequest):
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
 @app.post("/api/features/chlorophyll-edges", response_model=GeoJSONFeatureCollection)
-async def detect_chlorophyll_edges(request: ChlorophyllEdgesRequest):
+async def detect_chlorophyll_edges(request: ChlorophyllEdgesRequest, http_request: Request):
     """
     Detect chlorophyll edges using Canny edge detection
 
@@ -157,7 +240,8 @@ async def detect_chlorophyll_edges(request: ChlorophyllEdgesRequest):
         request: ChlorophyllEdgesRequest containing chlorophyll data and coordinates
 
     Returns:
-        GeoJSON FeatureCollection of chlorophyll edge Polygons
+        GeoJSON FeatureCollection of chlorophyll edge Polygons, or an Arrow IPC /
+        FlatGeobuf body when requested via the Accept header
     """
     try:
         # Convert lists to numpy arrays
@@ -172,29 +256,44 @@ async def detect_chlorophyll_edges(request: ChlorophyllEdgesRequest):
                 detail=f"Data dimensions mismatch: data shape {chl_array.shape}, lat length {len(lat_array)}, lon length {len(lon_array)}"
             )
 
+        # Coarsen large grids to the requested pyramid level
+        level, (chl_array, lon_array, lat_array) = GridPyramid(chl_array, lon_array, lat_array).select(
+            request.max_pixels, request.resolution
+        )
+
         logger.info(f"Detecting chlorophyll edges with low_thresh={request.low_thresh}, high_thresh={request.high_thresh}")
 
         # Detect edges
-        features = detector.detect_chlorophyll_edges(
-            chl_array=chl_array,
-            lon_array=lon_array,
-            lat_array=lat_array,
-            low_thresh=request.low_thresh,
-            high_thresh=request.high_thresh
+        features = await scheduler.run(
+            "chlorophyll_edges", chl_array.shape,
+            lambda: detector.detect_chlorophyll_edges(
+                chl_array=chl_array,
+                lon_array=lon_array,
+                lat_array=lat_array,
+                low_thresh=request.low_thresh,
+                high_thresh=request.high_thresh,
+                as_columns=True
+            )
         )
 
         logger.info(f"Detected {len(features)} chlorophyll edges")
 
-        return GeoJSONFeatureCollection(
-            features=features,
-            metadata={
-                "feature_count": len(features),
-                "low_thresh": request.low_thresh,
-                "high_thresh": request.high_thresh,
-                "data_shape": list(chl_array.shape)
-            }
-        )
+        metadata = {
+            "feature_count": len(features),
+            "low_thresh": request.low_thresh,
+            "high_thresh": request.high_thresh,
+            "data_shape": list(chl_array.shape),
+            "pyramid_level": level
+        }
+
+        fmt = negotiate_format(http_request.headers.get("accept"))
+        if fmt != "geojson":
+            return binary_feature_response(features, fmt, metadata)
 
+        return GeoJSONFeatureCollection(features=features.to_geojson(), metadata=metadata)
+
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Value error in chlorophyll edge detection: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -202,8 +301,81 @@ async def detect_chlorophyll_edges(request: ChlorophyllEdgesRequest):
         logger.error(f"Error detecting chlorophyll edges: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
+@app.post("/api/features/phytoplankton-blooms", response_model=GeoJSONFeatureCollection)
+async def detect_phytoplankton_blooms(request: BloomSegmentationRequest, http_request: Request):
+    """
+    Segment phytoplankton blooms as regions enclosed by chlorophyll edges
+
+    Args:
+        request: BloomSegmentationRequest containing chlorophyll data and coordinates
+
+    Returns:
+        GeoJSON FeatureCollection of bloom Polygons with area, mean/max
+        chlorophyll and intensity class, or an Arrow IPC / FlatGeobuf body
+        when requested via the Accept header
+    """
+    try:
+        # Convert lists to numpy arrays
+        chl_array = np.array(request.data, dtype=np.float32)
+        lon_array = np.array(request.lon, dtype=np.float32)
+        lat_array = np.array(request.lat, dtype=np.float32)
+
+        # Validate dimensions
+        if chl_array.shape[0] != len(lat_array) or chl_array.shape[1] != len(lon_array):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Data dimensions mismatch: data shape {chl_array.shape}, lat length {len(lat_array)}, lon length {len(lon_array)}"
+            )
+
+        # Coarsen large grids to the requested pyramid level
+        level, (chl_array, lon_array, lat_array) = GridPyramid(chl_array, lon_array, lat_array).select(
+            request.max_pixels, request.resolution
+        )
+
+        logger.info(f"Segmenting phytoplankton blooms with min_area={request.min_area}")
+
+        # Segment blooms
+        features = await scheduler.run(
+            "blooms", chl_array.shape,
+            lambda: detector.detect_phytoplankton_blooms(
+                chl_array=chl_array,
+                lon_array=lon_array,
+                lat_array=lat_array,
+                low_thresh=request.low_thresh,
+                high_thresh=request.high_thresh,
+                min_area=request.min_area,
+                as_columns=True
+            )
+        )
+
+        logger.info(f"Detected {len(features)} phytoplankton blooms")
+
+        metadata = {
+            "feature_count": len(features),
+            "low_thresh": request.low_thresh,
+            "high_thresh": request.high_thresh,
+            "min_area": request.min_area,
+            "data_shape": list(chl_array.shape),
+            "pyramid_level": level
+        }
+
+        fmt = negotiate_format(http_request.headers.get("accept"))
+        if fmt != "geojson":
+            return binary_feature_response(features, fmt, metadata)
+
+        return GeoJSONFeatureCollection(features=features.to_geojson(), metadata=metadata)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logger.error(f"Value error in bloom segmentation: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error segmenting phytoplankton blooms: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+
 @app.post("/api/features/eddies", response_model=GeoJSONFeatureCollection)
-async def detect_eddies(request: EddyDetectionRequest):
+async def detect_eddies(request: EddyDetectionRequest, http_request: Request):
     """
     Detect mesoscale eddies using Okubo-Weiss parameter
 
@@ -211,7 +383,8 @@ async def detect_eddies(request: EddyDetectionRequest):
         request: EddyDetectionRequest containing SST data and coordinates
 
     Returns:
-        GeoJSON FeatureCollection of eddy Polygons
+        GeoJSON FeatureCollection of eddy Polygons, or an Arrow IPC /
+        FlatGeobuf body when requested via the Accept header
     """
     try:
         # Convert lists to numpy arrays
@@ -226,27 +399,42 @@ async def detect_eddies(request: EddyDetectionRequest):
                 detail=f"Data dimensions mismatch: data shape {sst_array.shape}, lat length {len(lat_array)}, lon length {len(lon_array)}"
             )
 
+        # Coarsen large grids to the requested pyramid level
+        level, (sst_array, lon_array, lat_array) = GridPyramid(sst_array, lon_array, lat_array).select(
+            request.max_pixels, request.resolution
+        )
+
         logger.info(f"Detecting eddies with min_radius_km={request.min_radius_km}")
 
         # Detect eddies
-        features = detector.detect_eddies(
-            sst_array=sst_array,
-            lon_array=lon_array,
-            lat_array=lat_array,
-            min_radius_km=request.min_radius_km
+        features = await scheduler.run(
+            "eddies", sst_array.shape,
+            lambda: detector.detect_eddies(
+                sst_array=sst_array,
+                lon_array=lon_array,
+                lat_array=lat_array,
+                min_radius_km=request.min_radius_km,
+                as_columns=True
+            )
         )
 
         logger.info(f"Detected {len(features)} eddies")
 
-        return GeoJSONFeatureCollection(
-            features=features,
-            metadata={
-                "feature_count": len(features),
-                "min_radius_km": request.min_radius_km,
-                "data_shape": list(sst_array.shape)
-            }
-        )
+        metadata = {
+            "feature_count": len(features),
+            "min_radius_km": request.min_radius_km,
+            "data_shape": list(sst_array.shape),
+            "pyramid_level": level
+        }
 
+        fmt = negotiate_format(http_request.headers.get("accept"))
+        if fmt != "geojson":
+            return binary_feature_response(features, fmt, metadata)
+
+        return GeoJSONFeatureCollection(features=features.to_geojson(), metadata=metadata)
+
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Value error in eddy detection: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -254,169 +442,625 @@ async def detect_eddies(request: EddyDetectionRequest):
         logger.error(f"Error detecting eddies: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
-# Legacy GET endpoints for compatibility with existing Next.js routes
-# These return sample data - full implementation would require Copernicus data fetching
+# Grid session endpoints
+# A grid is uploaded or fetched once; threshold changes then only redo the
+# final thresholding/contour step against server-side intermediates
 
-@app.get("/ocean-features/fronts")
-async def get_thermal_fronts_legacy(
-    bbox: str = Query(..., description="Bounding box as 'south,west,north,east'"),
-    date: str = Query(..., description="Date in ISO format YYYY-MM-DD"),
-    threshold: float = Query(0.5, description="Temperature gradient threshold")
+@app.post("/api/sessions")
+async def create_grid_session(request: OceanDataRequest):
+    """
+    Upload a grid once and get a session ID for repeated detection
+
+    Args:
+        request: OceanDataRequest containing SST or chlorophyll data and coordinates
+
+    Returns:
+        Session summary including session_id
+    """
+    data_array = np.array(request.data, dtype=np.float32)
+    lon_array = np.array(request.lon, dtype=np.float32)
+    lat_array = np.array(request.lat, dtype=np.float32)
+
+    if data_array.ndim != 2 or data_array.shape[0] != len(lat_array) or data_array.shape[1] != len(lon_array):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Data dimensions mismatch: data shape {data_array.shape}, lat length {len(lat_array)}, lon length {len(lon_array)}"
+        )
+
+    _, (data_array, lon_array, lat_array) = GridPyramid(data_array, lon_array, lat_array).select(
+        request.max_pixels, request.resolution
+    )
+
+    _check_session_budget(data_array.size)
+    try:
+        session = sessions.add(GridSession(detector, data_array, lon_array, lat_array))
+    except SessionTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    logger.info(f"Created grid session {session.session_id} with shape {data_array.shape}")
+    return session.describe()
+
+@app.post("/api/sessions/fetch")
+async def create_fetched_grid_session(request: FetchSessionRequest):
+    """
+    Fetch a Copernicus grid (through the shared grid cache) into a session
+
+    Args:
+        request: FetchSessionRequest with product, bbox and optional date
+
+    Returns:
+        Session summary including session_id
+    """
+    from app.copernicus_data import get_sst_grid, get_chlorophyll_grid
+
+    fetchers = {"sst": get_sst_grid, "chlorophyll": get_chlorophyll_grid}
+    if request.product not in fetchers:
+        raise HTTPException(status_code=400, detail="Invalid product. Expected: 'sst' or 'chlorophyll'")
+
+    south, west, north, east = _parse_bbox(request.bbox)
+    day = _parse_date(request.date) if request.date else None
+
+    resolution = SST_RESOLUTION_DEG if request.product == "sst" else CHL_RESOLUTION_DEG
+    # Refuse oversized bboxes before downloading anything
+    pixels = bbox_pixels(south, west, north, east, resolution)
+    _check_session_budget(pixels)
+    try:
+        sessions.check_pixels(pixels)
+    except SessionTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    result = await asyncio.get_running_loop().run_in_executor(
+        None, fetchers[request.product], west, east, south, north, day
+    )
+    if result is None:
+        raise HTTPException(status_code=503, detail=f"{request.product} data unavailable")
+    data_array, lon_array, lat_array = result
+
+    try:
+        session = sessions.add(GridSession(
+            detector, data_array, lon_array, lat_array,
+            source={"type": "copernicus", "product": request.product,
+                    "bbox": [south, west, north, east], "date": request.date}
+        ))
+    except SessionTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    logger.info(f"Created {request.product} grid session {session.session_id} with shape {data_array.shape}")
+    return session.describe()
+
+def _check_session_budget(pixels: int) -> None:
+    """Refuse session grids on which the costliest detector would exceed the request budget"""
+    scheduler.check_budget(max(scheduler.estimate(name, pixels) for name in scheduler.cost_models), pixels)
+
+def _get_session(session_id: str) -> GridSession:
+    """Look up a session or raise 404"""
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session: {session_id}")
+    return session
+
+@app.get("/api/sessions/{session_id}")
+async def get_grid_session(session_id: str):
+    """Describe a grid session and its cached intermediates"""
+    return _get_session(session_id).describe()
+
+@app.delete("/api/sessions/{session_id}")
+async def delete_grid_session(session_id: str):
+    """Release a grid session and its intermediates"""
+    if not sessions.remove(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session: {session_id}")
+    return {"status": "deleted", "session_id": session_id}
+
+@app.get("/api/sessions/{session_id}/thermal-fronts", response_model=GeoJSONFeatureCollection)
+async def session_thermal_fronts(
+    session_id: str,
+    threshold: float = Query(0.5, description="Temperature gradient threshold (°C/km)"),
+    mode: str = Query("contour", description="Front geometry: 'contour' or 'centerline'")
 ):
-    """Legacy GET endpoint for thermal fronts (returns sample data)"""
-    logger.info(f"Legacy GET /ocean-features/fronts called with bbox={bbox}, date={date}")
+    """Thermal fronts for a session grid; only thresholding and contouring rerun"""
+    if mode not in FRONT_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode. Expected one of {list(FRONT_MODES)}")
+    session = _get_session(session_id)
+    features = await scheduler.run(
+        session.cost_label("thermal_fronts"), session.data.shape, session.thermal_fronts, threshold, False, mode
+    )
+    return GeoJSONFeatureCollection(
+        features=features,
+        metadata={
+            "feature_count": len(features),
+            "threshold": threshold,
+            "mode": mode,
+            "data_shape": list(session.data.shape),
+            "session_id": session_id
+        }
+    )
+
+@app.get("/api/sessions/{session_id}/chlorophyll-edges", response_model=GeoJSONFeatureCollection)
+async def session_chlorophyll_edges(
+    session_id: str,
+    low_thresh: float = Query(0.1, description="Lower threshold for Canny detection"),
+    high_thresh: float = Query(0.3, description="Upper threshold for Canny detection")
+):
+    """Chlorophyll edges for a session grid; only Canny and contouring rerun"""
+    session = _get_session(session_id)
+    features = await scheduler.run(
+        session.cost_label("chlorophyll_edges"), session.data.shape, session.chlorophyll_edges, low_thresh, high_thresh
+    )
+    return GeoJSONFeatureCollection(
+        features=features,
+        metadata={
+            "feature_count": len(features),
+            "low_thresh": low_thresh,
+            "high_thresh": high_thresh,
+            "data_shape": list(session.data.shape),
+            "session_id": session_id
+        }
+    )
+
+@app.get("/api/sessions/{session_id}/phytoplankton-blooms", response_model=GeoJSONFeatureCollection)
+async def session_phytoplankton_blooms(
+    session_id: str,
+    low_thresh: float = Query(0.1, description="Lower threshold for Canny detection"),
+    high_thresh: float = Query(0.3, description="Upper threshold for Canny detection"),
+    min_area: int = Query(100, description="Minimum bloom size in pixels")
+):
+    """Phytoplankton blooms for a session grid; reuses the blurred CHL intermediate"""
+    session = _get_session(session_id)
+    features = await scheduler.run(
+        session.cost_label("blooms"), session.data.shape, session.phytoplankton_blooms, low_thresh, high_thresh, min_area
+    )
+    return GeoJSONFeatureCollection(
+        features=features,
+        metadata={
+            "feature_count": len(features),
+            "low_thresh": low_thresh,
+            "high_thresh": high_thresh,
+            "min_area": min_area,
+            "data_shape": list(session.data.shape),
+            "session_id": session_id
+        }
+    )
 
-    # Parse bbox
+@app.get("/api/sessions/{session_id}/eddies", response_model=GeoJSONFeatureCollection)
+async def session_eddies(
+    session_id: str,
+    min_radius_km: float = Query(10.0, description="Minimum eddy radius in kilometers")
+):
+    """Eddies for a session grid; only the radius filter reruns"""
+    session = _get_session(session_id)
+    features = await scheduler.run(
+        session.cost_label("eddies"), session.data.shape, session.eddies, min_radius_km
+    )
+    return GeoJSONFeatureCollection(
+        features=features,
+        metadata={
+            "feature_count": len(features),
+            "min_radius_km": min_radius_km,
+            "data_shape": list(session.data.shape),
+            "session_id": session_id
+        }
+    )
+
+# Legacy GET endpoints for compatibility with existing Next.js routes
+# Each endpoint fetches only the product it needs (via the shared grid cache)
+# and runs only its own detector
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """Parse a 'south,west,north,east' bbox string"""
     try:
         south, west, north, east = map(float, bbox.split(','))
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid bbox format. Expected: 'south,west,north,east'")
+    return south, west, north, east
 
-    # Return sample thermal front data
-    # In production, this would fetch real Copernicus SST data
-    features = [
-        {
-            "type": "Feature",
-            "properties": {
-                "feature_type": "thermal_front",
-                "strength": 0.8,
-                "threshold": threshold,
-                "id": "demo_front_1"
-            },
-            "geometry": {
-                "type": "LineString",
-                "coordinates": [
-                    [west + (east - west) * 0.2, south + (north - south) * 0.3],
-                    [west + (east - west) * 0.4, south + (north - south) * 0.5],
-                    [west + (east - west) * 0.6, south + (north - south) * 0.4],
-                    [west + (east - west) * 0.8, south + (north - south) * 0.6]
-                ]
-            }
-        }
-    ]
+def _parse_date(date: str) -> datetime:
+    """Parse an ISO YYYY-MM-DD date string"""
+    try:
+        return datetime.strptime(date[:10], "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Expected: 'YYYY-MM-DD'")
 
+def _legacy_response(features: List[Dict], bbox: Tuple[float, float, float, float],
+                     date: str, **params) -> Dict:
+    """Build the FeatureCollection returned by the legacy GET endpoints"""
     return {
         "type": "FeatureCollection",
         "features": features,
         "metadata": {
-            "bbox": [south, west, north, east],
+            "bbox": list(bbox),
             "date": date,
             "feature_count": len(features),
-            "threshold": threshold,
-            "mode": "demo"
+            **params,
+            "mode": "real"
         }
     }
 
+async def _fetch_and_detect(product: str, detector_name: str, detect: Callable,
+                            bbox: Tuple[float, float, float, float], day: datetime,
+                            max_pixels: Optional[int], resolution: Optional[float]):
+    """
+    Fetch one product's pyramid level and run a detector on it for a legacy GET
+
+    The cost is estimated from the bbox so oversized requests are rejected
+    before the download; fetch and detection then run together on the
+    scheduler lane.
+
+    Args:
+        product: SST_PRODUCT or CHL_PRODUCT
+        detector_name: Cost model / metrics label of the detector
+        detect: Called as detect(data, lon, lat, mask), returns the features
+        bbox: (south, west, north, east)
+        day: Data date
+
+    Returns:
+        (pyramid level, features)
+    """
+    from app.copernicus_data import get_grid_level_masked, SST_PRODUCT
+
+    south, west, north, east = bbox
+    is_sst = product == SST_PRODUCT
+    native = SST_RESOLUTION_DEG if is_sst else CHL_RESOLUTION_DEG
+    pixels = budgeted_pixels(south, west, north, east, native, max_pixels, resolution)
+
+    def fetch_and_detect():
+        result = get_grid_level_masked(product, west, east, south, north, day, max_pixels, resolution)
+        if result is None:
+            label = "SST" if is_sst else "Chlorophyll"
+            raise HTTPException(status_code=503, detail=f"{label} data unavailable for {day:%Y-%m-%d}")
+        level, (data, lon, lat), mask = result
+        return level, detect(data, lon, lat, mask)
+
+    try:
+        return await scheduler.run_with_cost(
+            scheduler.estimate(detector_name, pixels), pixels, detector_name, fetch_and_detect
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error detecting {detector_name.replace('_', ' ')}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
+
+def _data_revision(products: List[str], dates: List[datetime],
+                   bbox: Tuple[float, float, float, float]) -> Optional[str]:
+    """
+    Revision of the grids behind a result: "" when every date is archived,
+    else a hash over the cached grids of the recent dates (None if any is not
+    cached yet)
+    """
+    from app.copernicus_data import grid_revision
+
+    south, west, north, east = bbox
+    recent = [day for day in dates if is_recent(day)]
+    revisions = [
+        grid_revision(product, west, east, south, north, day)
+        for product in products for day in recent
+    ]
+    if None in revisions:
+        return None
+    return "-".join(revisions)
+
+def _cache_validators(http_request: Request, endpoint: str, products: List[str],
+                      dates: List[datetime], bbox: Tuple[float, float, float, float],
+                      params: Dict, fmt: str = "geojson", vary_accept: bool = False,
+                      revision_dates: Optional[List[datetime]] = None):
+    """
+    Cache headers for a feature GET and, for a matching conditional request,
+    the 304 response to return before detecting anything
+
+    Recent days may still be revised, so their ETag includes the revision of
+    the cached grids and only If-None-Match can produce a 304 for them; no
+    304 is possible until those grids are cached.
+
+    Args:
+        dates: Date(s) the response covers (the last one drives max-age)
+        revision_dates: Days whose grids the result is computed from (default: dates)
+
+    Returns:
+        (validators, cached): validators() gives the headers for the computed
+        response ({} if the grid revision is still unknown); cached is the
+        304 response or None
+    """
+    def validators() -> Dict[str, str]:
+        revision = _data_revision(products, revision_dates or dates, bbox)
+        if revision is None:
+            return {}
+        etag = feature_etag(endpoint, products, dates, bbox, params, fmt, revision)
+        return cache_headers(etag, max(dates), vary_accept=vary_accept)
+
+    headers = validators()
+    if not headers:
+        return validators, None
+    etag_only = any(is_recent(day) for day in (revision_dates or dates))
+    return validators, not_modified(http_request, headers, etag_only=etag_only)
+
+@app.get("/ocean-features/fronts")
+async def get_thermal_fronts_legacy(
+    http_request: Request,
+    response: Response,
+    bbox: str = Query(..., description="Bounding box as 'south,west,north,east'"),
+    date: str = Query(..., description="Date in ISO format YYYY-MM-DD"),
+    threshold: float = Query(0.5, description="Temperature gradient threshold"),
+    mode: str = Query("contour", description="Front geometry: 'contour' or 'centerline'"),
+    max_pixels: Optional[int] = Query(None, description="Run detection on a pyramid level with at most this many cells"),
+    resolution: Optional[float] = Query(None, description="Run detection on a pyramid level with pixels at least this size (degrees)")
+):
+    """Legacy GET endpoint for thermal fronts (cache-backed SST detection)"""
+    logger.info(f"Legacy GET /ocean-features/fronts called with bbox={bbox}, date={date}")
+
+    from app.copernicus_data import SST_PRODUCT
+
+    south, west, north, east = _parse_bbox(bbox)
+    day = _parse_date(date)
+
+    validators, cached = _cache_validators(
+        http_request, "fronts", [SST_PRODUCT], [day], (south, west, north, east),
+        {"threshold": threshold, "mode": mode, "max_pixels": max_pixels, "resolution": resolution}
+    )
+    if cached is not None:
+        return cached
+
+    level, features = await _fetch_and_detect(
+        SST_PRODUCT, "thermal_fronts",
+        lambda sst, lon, lat, mask: detector.detect_thermal_fronts(
+            sst, lon, lat, threshold=threshold, mask=mask, mode=mode
+        ),
+        (south, west, north, east), day, max_pixels, resolution
+    )
+
+    response.headers.update(validators())
+    return _legacy_response(features, (south, west, north, east), date,
+                            threshold=threshold, front_mode=mode, pyramid_level=level)
+
 @app.get("/ocean-features/edges")
 async def get_chlorophyll_edges_legacy(
+    http_request: Request,
+    response: Response,
     bbox: str = Query(..., description="Bounding box as 'south,west,north,east'"),
     date: str = Query(..., description="Date in ISO format YYYY-MM-DD"),
     low_thresh: float = Query(0.1, description="Lower threshold"),
-    high_thresh: float = Query(0.3, description="Upper threshold")
+    high_thresh: float = Query(0.3, description="Upper threshold"),
+    max_pixels: Optional[int] = Query(None, description="Run detection on a pyramid level with at most this many cells"),
+    resolution: Optional[float] = Query(None, description="Run detection on a pyramid level with pixels at least this size (degrees)")
 ):
-    """Legacy GET endpoint for chlorophyll edges (returns sample data)"""
+    """Legacy GET endpoint for chlorophyll edges (cache-backed CHL detection)"""
     logger.info(f"Legacy GET /ocean-features/edges called with bbox={bbox}, date={date}")
 
-    # Parse bbox
-    try:
-        south, west, north, east = map(float, bbox.split(','))
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid bbox format. Expected: 'south,west,north,east'")
-
-    # Return sample chlorophyll edge data
-    features = [
-        {
-            "type": "Feature",
-            "properties": {
-                "feature_type": "chlorophyll_edge",
-                "area_pixels": 2500,
-                "perimeter_pixels": 180,
-                "id": "demo_edge_1"
-            },
-            "geometry": {
-                "type": "Polygon",
-                "coordinates": [[
-                    [west + (east - west) * 0.3, south + (north - south) * 0.3],
-                    [west + (east - west) * 0.7, south + (north - south) * 0.3],
-                    [west + (east - west) * 0.7, south + (north - south) * 0.6],
-                    [west + (east - west) * 0.3, south + (north - south) * 0.6],
-                    [west + (east - west) * 0.3, south + (north - south) * 0.3]
-                ]]
-            }
-        }
-    ]
-
-    return {
-        "type": "FeatureCollection",
-        "features": features,
-        "metadata": {
-            "bbox": [south, west, north, east],
-            "date": date,
-            "feature_count": len(features),
-            "mode": "demo"
-        }
-    }
+    from app.copernicus_data import CHL_PRODUCT
+
+    south, west, north, east = _parse_bbox(bbox)
+    day = _parse_date(date)
+
+    validators, cached = _cache_validators(
+        http_request, "edges", [CHL_PRODUCT], [day], (south, west, north, east),
+        {"low_thresh": low_thresh, "high_thresh": high_thresh,
+         "max_pixels": max_pixels, "resolution": resolution}
+    )
+    if cached is not None:
+        return cached
+
+    level, features = await _fetch_and_detect(
+        CHL_PRODUCT, "chlorophyll_edges",
+        lambda chl, lon, lat, mask: detector.detect_chlorophyll_edges(
+            chl, lon, lat, low_thresh=low_thresh, high_thresh=high_thresh, mask=mask
+        ),
+        (south, west, north, east), day, max_pixels, resolution
+    )
+
+    response.headers.update(validators())
+    return _legacy_response(
+        features, (south, west, north, east), date,
+        low_thresh=low_thresh, high_thresh=high_thresh, pyramid_level=level
+    )
 
 @app.get("/ocean-features/eddies")
 async def get_eddies_legacy(
+    http_request: Request,
+    response: Response,
     bbox: str = Query(..., description="Bounding box as 'south,west,north,east'"),
     date: str = Query(..., description="Date in ISO format YYYY-MM-DD"),
-    min_radius: float = Query(10.0, description="Minimum eddy radius in km")
+    min_radius: float = Query(10.0, description="Minimum eddy radius in km"),
+    max_pixels: Optional[int] = Query(None, description="Run detection on a pyramid level with at most this many cells"),
+    resolution: Optional[float] = Query(None, description="Run detection on a pyramid level with pixels at least this size (degrees)")
 ):
-    """Legacy GET endpoint for eddies (returns sample data)"""
+    """Legacy GET endpoint for eddies (cache-backed Okubo-Weiss detection)"""
     logger.info(f"Legacy GET /ocean-features/eddies called with bbox={bbox}, date={date}")
 
-    # Parse bbox
+    from app.copernicus_data import SST_PRODUCT
+
+    south, west, north, east = _parse_bbox(bbox)
+    day = _parse_date(date)
+
+    validators, cached = _cache_validators(
+        http_request, "eddies", [SST_PRODUCT], [day], (south, west, north, east),
+        {"min_radius": min_radius, "max_pixels": max_pixels, "resolution": resolution}
+    )
+    if cached is not None:
+        return cached
+
+    level, features = await _fetch_and_detect(
+        SST_PRODUCT, "eddies",
+        lambda sst, lon, lat, mask: detector.detect_eddies(
+            sst, lon, lat, min_radius_km=min_radius, mask=mask
+        ),
+        (south, west, north, east), day, max_pixels, resolution
+    )
+
+    response.headers.update(validators())
+    return _legacy_response(features, (south, west, north, east), date,
+                            min_radius_km=min_radius, pyramid_level=level)
+
+@app.get("/ocean-features/climatology")
+async def get_front_climatology(
+    http_request: Request,
+    response: Response,
+    bbox: str = Query(..., description="Bounding box as 'south,west,north,east'"),
+    start: str = Query(..., description="First date in ISO format YYYY-MM-DD"),
+    end: str = Query(..., description="Last date (inclusive) in ISO format YYYY-MM-DD"),
+    threshold: float = Query(0.5, description="Temperature gradient threshold (°C/km)"),
+    output: str = Query("contours", description="'contours' (persistence isolines) or 'raster'"),
+    levels: str = Query("0.25,0.5,0.75", description="Front-frequency contour levels"),
+    max_pixels: Optional[int] = Query(None, description="Aggregate on a pyramid level with at most this many cells")
+):
+    """
+    Front persistence and SST climatology over a date range
+
+    Streams daily SST grids through the thermal front thresholding step and
+    accumulates per-pixel front frequency, mean gradient and SST mean/variance
+    with constant memory in the number of days.
+    """
+    from app.climatology import aggregate_sst_climatology
+    from app.copernicus_data import SST_PRODUCT
+
+    south, west, north, east = _parse_bbox(bbox)
+    first, last = _parse_date(start), _parse_date(end)
+    if last < first:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    dates = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    if len(dates) > 366:
+        raise HTTPException(status_code=400, detail="Date range is limited to 366 days")
+    if output not in ("contours", "raster"):
+        raise HTTPException(status_code=400, detail="Invalid output. Expected: 'contours' or 'raster'")
     try:
-        south, west, north, east = map(float, bbox.split(','))
+        contour_levels = [float(v) for v in levels.split(",")]
     except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid bbox format. Expected: 'south,west,north,east'")
-
-    # Return sample eddy data
-    center_lat = (south + north) / 2
-    center_lon = (west + east) / 2
-
-    features = [
-        {
-            "type": "Feature",
-            "properties": {
-                "feature_type": "eddy",
-                "eddy_type": "warm_core",
-                "radius_km": 25.0,
-                "centroid_lat": center_lat + 0.1,
-                "centroid_lon": center_lon - 0.1,
-                "okubo_weiss": -0.15,
-                "sst_anomaly": 1.2,
-                "id": "demo_eddy_1"
-            },
-            "geometry": {
-                "type": "Polygon",
-                "coordinates": [[
-                    [center_lon - 0.1, center_lat + 0.1],
-                    [center_lon - 0.05, center_lat + 0.15],
-                    [center_lon, center_lat + 0.1],
-                    [center_lon - 0.05, center_lat + 0.05],
-                    [center_lon - 0.1, center_lat + 0.1]
-                ]]
-            }
-        }
-    ]
+        raise HTTPException(status_code=400, detail="Invalid levels. Expected comma-separated numbers")
+
+    validators, cached = _cache_validators(
+        http_request, "climatology", [SST_PRODUCT], [first, last], (south, west, north, east),
+        {"threshold": threshold, "output": output, "levels": contour_levels, "max_pixels": max_pixels},
+        revision_dates=dates
+    )
+    if cached is not None:
+        return cached
+
+    pixels = budgeted_pixels(south, west, north, east, SST_RESOLUTION_DEG, max_pixels, None)
+    cost = len(dates) * scheduler.estimate("thermal_fronts", pixels)
+    # The estimate covers detector time only; up to one CMEMS download per day
+    # must never tie up the interactive lane, so always run on the batch lane
+    clim = await scheduler.run_with_cost(
+        cost, pixels * len(dates), "front_climatology",
+        lambda: aggregate_sst_climatology(dates, west, east, south, north, threshold, max_pixels),
+        batch=True
+    )
+    if clim is None:
+        raise HTTPException(status_code=503, detail=f"SST data unavailable for {start}..{end}")
+
+    metadata = {
+        "bbox": [south, west, north, east],
+        "start": start,
+        "end": end,
+        "days": clim.days,
+        "threshold": threshold,
+        "data_shape": list(clim.shape)
+    }
+    response.headers.update(validators())
+    if output == "raster":
+        return {**clim.to_raster(), "metadata": metadata}
 
+    features = clim.persistence_contours(contour_levels)
     return {
         "type": "FeatureCollection",
         "features": features,
-        "metadata": {
-            "bbox": [south, west, north, east],
-            "date": date,
-            "feature_count": len(features),
-            "min_radius_km": min_radius,
-            "mode": "demo"
-        }
+        "metadata": {**metadata, "feature_count": len(features), "levels": contour_levels}
     }
 
+def _features_cost(south: float, west: float, north: float, east: float,
+                   max_pixels: Optional[int], resolution: Optional[float]) -> Tuple[float, int]:
+    """
+    Estimated cost and cell count of running every detector on both products
+    of a bbox, from the bbox alone so nothing has to be fetched first
+    """
+    sst_pixels = budgeted_pixels(south, west, north, east, SST_RESOLUTION_DEG, max_pixels, resolution)
+    chl_pixels = budgeted_pixels(south, west, north, east, CHL_RESOLUTION_DEG, max_pixels, resolution)
+    cost = (scheduler.estimate(["thermal_fronts", "eddies"], sst_pixels)
+            + scheduler.estimate(["chlorophyll_edges", "blooms"], chl_pixels))
+    return cost, sst_pixels + chl_pixels
+
+@app.get("/ocean-features/progressive")
+async def stream_progressive_features(
+    bbox: str = Query(..., description="Bounding box as 'south,west,north,east'"),
+    date: Optional[str] = Query(None, description="Date in ISO format YYYY-MM-DD (defaults to yesterday)"),
+    max_pixels: Optional[int] = Query(None, description="Cell budget of the full-resolution stage"),
+    resolution: Optional[float] = Query(None, description="Minimum pixel size (degrees) of the full-resolution stage"),
+    coarse_max_pixels: Optional[int] = Query(None, description="Cell budget of the coarse stage")
+):
+    """
+    Stream coarse-to-fine features as Server-Sent Events
+
+    Emits one event per stage as soon as it is ready: "coarse" (all detectors
+    of a product on a low-resolution pyramid level), "full" (one detector at
+    the requested resolution), "error" and finally "done". Requests over the
+    detection budget get a 413 instead of a stream. Each event's data
+    is a JSON object with the stage tag and, for feature stages, a GeoJSON
+    FeatureCollection.
+    """
+    from app.progressive import progressive_features, COARSE_MAX_PIXELS
+
+    south, west, north, east = _parse_bbox(bbox)
+    day = _parse_date(date) if date else datetime.now() - timedelta(days=1)
+    # Reject oversized requests with a plain 413 before the stream starts
+    # (and before anything is downloaded)
+    scheduler.check_budget(*_features_cost(south, west, north, east, max_pixels, resolution))
+
+    async def events():
+        async for event in progressive_features(
+            scheduler, detector, (south, west, north, east), day,
+            max_pixels, resolution, coarse_max_pixels or COARSE_MAX_PIXELS
+        ):
+            yield f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/ocean-features/progressive")
+async def websocket_progressive_features(websocket: WebSocket):
+    """
+    WebSocket variant of /ocean-features/progressive
+
+    The client sends one JSON message with the same parameters as the SSE
+    endpoint ({"bbox": "south,west,north,east", "date": ..., "max_pixels": ...})
+    and receives one JSON message per stage; the socket closes after "done".
+    """
+    from app.progressive import progressive_features, COARSE_MAX_PIXELS
+
+    await websocket.accept()
+    try:
+        params = await websocket.receive_json()
+        try:
+            south, west, north, east = _parse_bbox(str(params.get("bbox", "")))
+            day = _parse_date(params["date"]) if params.get("date") else datetime.now() - timedelta(days=1)
+            scheduler.check_budget(*_features_cost(
+                south, west, north, east, params.get("max_pixels"), params.get("resolution")
+            ))
+        except HTTPException as e:
+            await websocket.send_json({"stage": "error", "status": e.status_code, "detail": e.detail})
+            await websocket.close()
+            return
+
+        async for event in progressive_features(
+            scheduler, detector, (south, west, north, east), day,
+            params.get("max_pixels"), params.get("resolution"),
+            params.get("coarse_max_pixels") or COARSE_MAX_PIXELS
+        ):
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("Progressive WebSocket client disconnected")
+
+def _complete_levels(levels: Dict) -> bool:
+    """Whether both products were fetched; partial results must not be cached"""
+    return {"sst", "chlorophyll"} <= set(levels)
+
 @app.get("/ocean-features/real")
 async def get_real_ocean_features(
+    http_request: Request,
+    response: Response,
     bbox: str = Query(..., description="Bounding box as 'south,west,north,east'"),
+    date: Optional[str] = Query(None, description="Date in ISO format YYYY-MM-DD (defaults to yesterday)"),
+    max_pixels: Optional[int] = Query(None, description="Run detection on a pyramid level with at most this many cells"),
+    resolution: Optional[float] = Query(None, description="Run detection on a pyramid level with pixels at least this size (degrees)")
 ):
     """
     Get REAL ocean features from live Copernicus satellite data
@@ -424,26 +1068,70 @@ async def get_real_ocean_features(
     This endpoint fetches actual SST/CHL data from Copernicus Marine Service
     and runs scientific detection algorithms (Sobel, Canny, Okubo-Weiss).
 
-    Returns real oceanographic features - NOT demo data.
+    Returns real oceanographic features - NOT demo data. Send
+    Accept: application/vnd.apache.arrow.stream or application/flatgeobuf
+    for binary output instead of GeoJSON.
     """
     try:
-        from app.copernicus_data import generate_real_polygons_for_region
+        from app.copernicus_data import (
+            generate_real_polygons_for_region, detect_real_features, SST_PRODUCT, CHL_PRODUCT
+        )
 
-        # Parse bbox
-        try:
-            south, west, north, east = map(float, bbox.split(','))
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid bbox format. Expected: 'south,west,north,east'")
+        south, west, north, east = _parse_bbox(bbox)
+        # Resolve the default here so the ETag names the day actually fetched
+        day = _parse_date(date) if date else datetime.now() - timedelta(days=1)
+
+        fmt = negotiate_format(http_request.headers.get("accept"))
+        validators, cached = _cache_validators(
+            http_request, "real", [SST_PRODUCT, CHL_PRODUCT], [day], (south, west, north, east),
+            {"max_pixels": max_pixels, "resolution": resolution}, fmt=fmt, vary_accept=True
+        )
+        if cached is not None:
+            return cached
 
         logger.info(f"Fetching REAL ocean features for bbox: {bbox}")
 
+        # Estimate from the bbox before fetching anything so oversized
+        # requests are rejected without touching Copernicus
+        cost, pixels = _features_cost(south, west, north, east, max_pixels, resolution)
+
+        if fmt != "geojson":
+            features, levels = await scheduler.run_with_cost(
+                cost, pixels, "real_features",
+                lambda: detect_real_features(
+                    west, east, south, north, day, max_pixels=max_pixels, resolution_deg=resolution,
+                    detector=detector
+                )
+            )
+            logger.info(f"Generated {len(features)} real features ({fmt})")
+            binary_response = binary_feature_response(features, fmt, {
+                "bbox": [west, south, east, north],
+                "date": date,
+                "feature_count": len(features),
+                "pyramid_levels": levels,
+                "data_source": "Copernicus Marine Service (CMEMS)"
+            })
+            if _complete_levels(levels):
+                binary_response.headers.update(validators())
+            return binary_response
+
         # Generate real polygons from Copernicus data
-        result = generate_real_polygons_for_region(west, east, south, north)
+        result = await scheduler.run_with_cost(
+            cost, pixels, "real_features",
+            lambda: generate_real_polygons_for_region(
+                west, east, south, north, day, max_pixels=max_pixels, resolution_deg=resolution,
+                detector=detector
+            )
+        )
 
         logger.info(f"Generated {len(result['features'])} real features")
 
+        if _complete_levels(result["properties"]["pyramid_levels"]):
+            response.headers.update(validators())
         return result
 
+    except HTTPException:
+        raise
     except ImportError as e:
         logger.error(f"Import error: {e}")
         raise HTTPException(
@@ -457,7 +1145,6 @@ async def get_real_ocean_features(
 
 if __name__ == "__main__":
     import uvicorn
-    import os
 
     port = int(os.environ.get("PORT", 8010))
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,91 @@
+"""
+Grid Masks
+Land/no-data masks for product grids: which pixels hold data, a coastal band
+around the ones that don't, and the bounding box of the valid area so the
+detectors can crop land-dominated views and suppress coastline artifacts
+"""
+
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class GridMask(NamedTuple):
+    """
+    Valid-data mask of a grid
+
+    Kept as a tuple of three arrays so it can live in a GridCache next to the
+    grids it describes.
+
+    valid: True where the grid has data (ocean)
+    suppress: Invalid pixels plus a band of `coast_width` valid pixels around
+        them, where detector output is dropped because filled land values
+        dominate the operators' stencils
+    bounds: [row0, row1, col0, col1] of the valid area plus a margin
+    """
+    valid: np.ndarray
+    suppress: np.ndarray
+    bounds: np.ndarray
+
+    @classmethod
+    def from_data(cls, data: np.ndarray, coast_width: int = 2, margin: int = 3) -> "GridMask":
+        """
+        Build the mask of a grid from its NaN pixels
+
+        Args:
+            data: Grid values (NaN over land or missing data)
+            coast_width: Width in pixels of the suppressed coastal band
+            margin: Pixels kept around the valid area when cropping
+        """
+        valid = ~np.isnan(data)
+        if valid.all():
+            suppress = np.zeros(valid.shape, dtype=bool)
+            bounds = np.array([0, valid.shape[0], 0, valid.shape[1]])
+        elif not valid.any():
+            suppress = np.ones(valid.shape, dtype=bool)
+            bounds = np.zeros(4, dtype=int)
+        else:
+            from scipy import ndimage
+
+            suppress = ndimage.binary_dilation(
+                ~valid, structure=np.ones((3, 3), dtype=bool), iterations=coast_width
+            ) if coast_width > 0 else ~valid
+            rows = np.flatnonzero(valid.any(axis=1))
+            cols = np.flatnonzero(valid.any(axis=0))
+            bounds = np.array([
+                max(rows[0] - margin, 0), min(rows[-1] + 1 + margin, valid.shape[0]),
+                max(cols[0] - margin, 0), min(cols[-1] + 1 + margin, valid.shape[1])
+            ])
+        return cls(valid, suppress, bounds)
+
+    @property
+    def crop(self) -> Tuple[slice, slice]:
+        """Slices of the valid area's bounding box"""
+        r0, r1, c0, c1 = (int(b) for b in self.bounds)
+        return slice(r0, r1), slice(c0, c1)
+
+    @property
+    def all_valid(self) -> bool:
+        return not self.suppress.any()
+
+    @property
+    def any_valid(self) -> bool:
+        return bool(self.bounds[1] > self.bounds[0] and self.bounds[3] > self.bounds[2])
+
+    def valid_fraction(self) -> float:
+        return float(self.valid.mean()) if self.valid.size else 0.0
+
+
+def resolve_mask(data: np.ndarray, mask: Optional[GridMask] = None) -> GridMask:
+    """
+    Mask to use for a grid: the given (cached, static) mask if it covers every
+    NaN of this grid, otherwise one rebuilt from the grid itself
+
+    Cached land masks are computed once per product grid and bbox; a day with
+    extra gaps (e.g. clouds in an L3 product) falls back to its own mask.
+    """
+    if mask is None or mask.valid.shape != data.shape:
+        return GridMask.from_data(data)
+    if np.isnan(data[mask.valid]).any():
+        return GridMask.from_data(data)
+    return mask
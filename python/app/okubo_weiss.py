@@ -0,0 +1,163 @@
+"""
+Fused Okubo-Weiss Kernel
+Single-pass W computation with preallocated buffers, plus an equivalence
+check and benchmark against the reference np.gradient implementation.
+
+With u = -dT/dy / f and v = dT/dx / f, the strain and vorticity terms of the
+reference implementation reduce to
+
+    W = ((T_yy + T_xx)^2 - 4 * T_xy * T_yx) / f^2
+
+where the second derivatives are the same unit-spacing, first-order-edge
+differences np.gradient applies twice. Four difference passes into three
+scratch buffers replace the u, v, four derivative, S_n, S_s and omega arrays.
+
+Run `python -m app.okubo_weiss` to check equivalence and time both kernels.
+"""
+
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+OMEGA_EARTH = 7.2921e-5  # rad/s
+
+
+def _gradient(src: np.ndarray, axis: int, out: np.ndarray) -> np.ndarray:
+    """np.gradient(src, axis=axis) for unit spacing, written into out"""
+    src = np.moveaxis(src, axis, 0)
+    dst = np.moveaxis(out, axis, 0)
+    np.subtract(src[2:], src[:-2], out=dst[1:-1])
+    dst[1:-1] *= 0.5
+    np.subtract(src[1], src[0], out=dst[0])
+    np.subtract(src[-1], src[-2], out=dst[-1])
+    return out
+
+
+def okubo_weiss_fused(sst_array: np.ndarray, lat_array: np.ndarray,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Okubo-Weiss parameter from SST, equivalent to the reference implementation
+
+    Args:
+        sst_array: Sea surface temperature data (NaN filled with the mean)
+        lat_array: Latitude coordinates (for the Coriolis parameter)
+        out: Optional float64 output buffer of the grid's shape
+
+    Returns:
+        Okubo-Weiss parameter field (float64)
+    """
+    if min(sst_array.shape) < 2:
+        raise ValueError("Shape of array too small to calculate a numerical gradient")
+
+    sst = np.asarray(sst_array, dtype=np.float64)
+    nan = np.isnan(sst)
+    if nan.any():
+        sst = np.where(nan, np.nanmean(sst), sst)
+    del nan
+
+    if out is None:
+        out = np.empty(sst.shape, dtype=np.float64)
+
+    f = 2 * OMEGA_EARTH * np.sin(np.radians(np.mean(lat_array)))  # Coriolis parameter
+    if f == 0:
+        out.fill(0.0)
+        return out
+
+    d0 = _gradient(sst, 0, np.empty_like(out))
+    d1 = _gradient(sst, 1, np.empty_like(out))
+    scratch = np.empty_like(out)
+
+    # (T_yy + T_xx)^2
+    _gradient(d0, 0, out)
+    out += _gradient(d1, 1, scratch)
+    np.square(out, out=out)
+
+    # - 4 * T_xy * T_yx
+    _gradient(d0, 1, scratch)
+    scratch *= _gradient(d1, 0, d0)
+    scratch *= 4.0
+    out -= scratch
+
+    out /= f * f
+    return out
+
+
+def _test_grid(size: int, seed: int = 0):
+    """Synthetic grid with noise and a NaN land patch"""
+    from app.warmup import synthetic_grid
+
+    sst, _, lon, lat = synthetic_grid(size)
+    rng = np.random.default_rng(seed)
+    sst = sst.astype(np.float64) + rng.normal(0, 0.05, sst.shape)
+    sst[: size // 6, : size // 5] = np.nan
+    return sst, lon, lat
+
+
+def check_equivalence(sizes: Sequence[int] = (2, 3, 64, 257), rtol: float = 1e-9) -> Dict[int, float]:
+    """
+    Compare the fused kernel with the reference on synthetic grids
+
+    Returns:
+        Largest absolute difference relative to max |W| per grid size
+
+    Raises:
+        AssertionError: if any size exceeds rtol
+    """
+    from app.ocean_features import OceanFeatureDetector
+
+    reference = OceanFeatureDetector(okubo_weiss="reference")
+    errors = {}
+    for size in sizes:
+        sst, lon, lat = _test_grid(size)
+        expected = reference.calculate_okubo_weiss(sst, lon, lat)
+        actual = okubo_weiss_fused(sst, lat)
+        scale = max(float(np.max(np.abs(expected))), np.finfo(np.float64).tiny)
+        errors[size] = float(np.max(np.abs(actual - expected))) / scale
+        assert errors[size] <= rtol, f"size {size}: relative error {errors[size]:.2e} > {rtol:.0e}"
+    return errors
+
+
+def benchmark(sizes: Sequence[int] = (256, 1024, 2048), runs: int = 5) -> Dict[str, Dict]:
+    """
+    Median runtime and peak traced allocation of both kernels per grid size
+
+    Returns:
+        {"<kernel>@<size>": {"seconds": ..., "peak_mb": ...}}
+    """
+    import statistics
+    import tracemalloc
+
+    from app.ocean_features import OceanFeatureDetector
+
+    kernels = {
+        "reference": OceanFeatureDetector(okubo_weiss="reference"),
+        "fused": OceanFeatureDetector(okubo_weiss="fused"),
+    }
+    results = {}
+    for size in sizes:
+        sst, lon, lat = _test_grid(size)
+        for name, detector in kernels.items():
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                detector.calculate_okubo_weiss(sst, lon, lat)
+                samples.append(time.perf_counter() - start)
+
+            tracemalloc.start()
+            detector.calculate_okubo_weiss(sst, lon, lat)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[f"{name}@{size}"] = {
+                "seconds": statistics.median(samples),
+                "peak_mb": peak / 1e6,
+            }
+    return results
+
+
+if __name__ == "__main__":
+    for size, error in check_equivalence().items():
+        print(f"equivalence {size:>5}x{size:<5} max relative error {error:.2e}")
+    for label, result in benchmark().items():
+        print(f"{label:<16} {result['seconds'] * 1000:8.1f} ms  peak {result['peak_mb']:8.1f} MB")
@@ -0,0 +1,206 @@
+"""
+Progressive Feature Streaming
+Coarse-to-fine detection for large bboxes: both products are processed
+concurrently. For each, the coarse pyramid level is built first (one cheap
+downsample of the native grid) and its detectors' features are pushed as soon
+as they finish, while the full-resolution level is built and its detectors
+run alongside; each full detector's result is pushed as it finishes. Fetches
+and detectors both run on scheduler lanes. Every event carries a stage tag.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import logging
+from fastapi import HTTPException
+
+from app.copernicus_data import (
+    SST_PRODUCT, CHL_PRODUCT, get_grid_level_masked, grid_level, product_detectors
+)
+from app.feature_collection import FeatureColumns
+from app.ocean_features import OceanFeatureDetector
+from app.scheduler import DetectionScheduler, budgeted_pixels, SST_RESOLUTION_DEG, CHL_RESOLUTION_DEG
+
+logger = logging.getLogger(__name__)
+
+# Cell budget of the first (coarse) pass
+COARSE_MAX_PIXELS = int(os.environ.get("PROGRESSIVE_COARSE_MAX_PIXELS", 64 * 1024))
+
+PRODUCT_NAMES = {SST_PRODUCT: "sst", CHL_PRODUCT: "chlorophyll"}
+NATIVE_RESOLUTION_DEG = {SST_PRODUCT: SST_RESOLUTION_DEG, CHL_PRODUCT: CHL_RESOLUTION_DEG}
+
+
+def _features_event(stage: str, product: str, detectors: List[str], level: int,
+                    grid: tuple, features: FeatureColumns, started: float) -> Dict:
+    return {
+        "stage": stage,
+        "product": product,
+        "detectors": detectors,
+        "pyramid_level": level,
+        "data_shape": list(grid[0].shape),
+        "feature_count": len(features),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "type": "FeatureCollection",
+        "features": features.to_geojson(),
+    }
+
+
+def _error_event(product: str, detectors: List[str], error: Exception, started: float) -> Dict:
+    status = error.status_code if isinstance(error, HTTPException) else 500
+    detail = error.detail if isinstance(error, HTTPException) else str(error)
+    return {
+        "stage": "error",
+        "product": product,
+        "detectors": detectors,
+        "status": status,
+        "detail": detail,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def progressive_features(
+    scheduler: DetectionScheduler,
+    detector: OceanFeatureDetector,
+    bbox: Tuple[float, float, float, float],
+    day: datetime,
+    max_pixels: Optional[int] = None,
+    resolution: Optional[float] = None,
+    coarse_max_pixels: int = COARSE_MAX_PIXELS
+) -> AsyncIterator[Dict]:
+    """
+    Yield detection results for a bbox stage by stage
+
+    Stages:
+        coarse: all detectors of one product on a pyramid level within
+            coarse_max_pixels (skipped when that is no coarser than full)
+        full: one detector on the requested level (max_pixels/resolution)
+        error: a product could not be fetched or a detector failed/was rejected
+        done: final event once every product pipeline has finished
+
+    The coarse level is fetched and detected first; the full level is only
+    built while the coarse detectors run. Fetches and detectors go through
+    the scheduler, so admission control and the interactive/batch lanes
+    apply to every stage. Callers check the request budget beforehand.
+
+    Args:
+        scheduler: Scheduler running the detectors
+        detector: Detector instance
+        bbox: (south, west, north, east)
+        day: Data date
+        max_pixels: Cell budget of the full-resolution stage
+        resolution: Minimum pixel size (degrees) of the full-resolution stage
+        coarse_max_pixels: Cell budget of the coarse stage
+    """
+    south, west, north, east = bbox
+    started = time.perf_counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    runners = product_detectors(detector)
+    coarse_budget = min(max_pixels, coarse_max_pixels) if max_pixels else coarse_max_pixels
+
+    def fetch(product: str, pixels: Optional[int]):
+        return get_grid_level_masked(product, west, east, south, north, day, pixels, resolution)
+
+    def fetch_coarse(product: str):
+        """Coarse level plus the level the full stage will use (None, None if unavailable)"""
+        coarse = fetch(product, coarse_budget)
+        if coarse is None:
+            return None, None
+        return coarse, grid_level(product, west, east, south, north, day, max_pixels, resolution)
+
+    async def on_lane(product: str, pixels: int, stage: str, fn: Callable, *args):
+        """Run blocking fetch work on the lane the product's detectors get at this size"""
+        names = list(runners[product])
+        return await scheduler.run_with_cost(
+            scheduler.estimate(names, pixels), pixels, f"{PRODUCT_NAMES[product]} {stage} fetch", fn, *args
+        )
+
+    async def unavailable(product: str) -> None:
+        await queue.put(_error_event(
+            PRODUCT_NAMES[product], list(runners[product]),
+            HTTPException(status_code=503, detail=f"{PRODUCT_NAMES[product]} data unavailable"),
+            started
+        ))
+
+    async def run_detectors(product: str, names: List[str], level: int, grid: tuple,
+                            stage: str, fn: Callable) -> None:
+        try:
+            features = await scheduler.run(names, grid[0].shape, fn)
+        except Exception as e:
+            logger.warning(f"Progressive {stage} {names} failed: {e}")
+            await queue.put(_error_event(PRODUCT_NAMES[product], names, e, started))
+            return
+        await queue.put(_features_event(stage, PRODUCT_NAMES[product], names, level, grid, features, started))
+
+    async def run_full(product: str, full_pixels: int, result=None) -> None:
+        detectors = runners[product]
+        if result is None:
+            try:
+                result = await on_lane(product, full_pixels, "full", fetch, product, max_pixels)
+            except Exception as e:
+                await queue.put(_error_event(PRODUCT_NAMES[product], list(detectors), e, started))
+                return
+            if result is None:
+                await unavailable(product)
+                return
+        level, grid, mask = result
+        await asyncio.gather(*(
+            run_detectors(
+                product, [name], level, grid, "full",
+                lambda run=run: run(grid, mask)
+            )
+            for name, run in detectors.items()
+        ))
+
+    async def run_product(product: str) -> None:
+        try:
+            detectors = runners[product]
+            full_pixels = budgeted_pixels(
+                south, west, north, east, NATIVE_RESOLUTION_DEG[product], max_pixels, resolution
+            )
+
+            # The native grid is downloaded once; the coarse level is a cheap
+            # downsample of it, so its features don't wait for the full level
+            coarse, full_level = await on_lane(
+                product, min(coarse_budget, full_pixels), "coarse", fetch_coarse, product
+            )
+            if coarse is None:
+                await unavailable(product)
+                return
+            coarse_level, coarse_grid, coarse_mask = coarse
+
+            if coarse_level <= full_level:
+                # Not coarser than the full level: run the full stage on it once
+                await run_full(product, full_pixels, coarse)
+                return
+
+            await asyncio.gather(
+                run_detectors(
+                    product, list(detectors), coarse_level, coarse_grid, "coarse",
+                    lambda: FeatureColumns.concat(
+                        run(coarse_grid, coarse_mask) for run in detectors.values()
+                    )
+                ),
+                run_full(product, full_pixels)
+            )
+        except Exception as e:
+            await queue.put(_error_event(PRODUCT_NAMES[product], list(runners[product]), e, started))
+        finally:
+            await queue.put(None)
+
+    tasks = [asyncio.create_task(run_product(product)) for product in (SST_PRODUCT, CHL_PRODUCT)]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await queue.get()
+            if event is None:
+                remaining -= 1
+                continue
+            yield event
+        yield {"stage": "done", "elapsed_seconds": round(time.perf_counter() - started, 3)}
+    finally:
+        # Client went away: stop pipelines that have not reached a detector yet
+        for task in tasks:
+            task.cancel()
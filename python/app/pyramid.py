@@ -0,0 +1,164 @@
+"""
+Multi-resolution Grid Pyramid
+NaN-aware block-mean downsampling of SST/CHL grids for coarse-to-fine detection
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+Grid = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _block_mean_1d(coords: np.ndarray, factor: int) -> np.ndarray:
+    """Average a 1D coordinate array over blocks of `factor` (last block may be short)"""
+    n_blocks = math.ceil(len(coords) / factor)
+    padded = np.full(n_blocks * factor, np.nan, dtype=np.float64)
+    padded[:len(coords)] = coords
+    return np.nanmean(padded.reshape(n_blocks, factor), axis=1)
+
+
+def block_mean(data: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Downsample a 2D grid by averaging factor x factor blocks, ignoring NaNs
+
+    Blocks that are entirely NaN (land, cloud) stay NaN. Grids whose shape is
+    not a multiple of factor keep a partial block at the bottom/right edge.
+
+    Args:
+        data: 2D data array
+        factor: Block size in pixels (>= 1)
+
+    Returns:
+        Downsampled float32 array of shape ceil(rows/factor) x ceil(cols/factor)
+    """
+    if factor <= 1:
+        return data
+    rows, cols = data.shape
+    out_rows, out_cols = math.ceil(rows / factor), math.ceil(cols / factor)
+
+    padded = np.full((out_rows * factor, out_cols * factor), np.nan, dtype=np.float32)
+    padded[:rows, :cols] = data
+    blocks = padded.reshape(out_rows, factor, out_cols, factor)
+
+    valid = ~np.isnan(blocks)
+    counts = valid.sum(axis=(1, 3))
+    sums = np.where(valid, blocks, 0).sum(axis=(1, 3), dtype=np.float64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    means[counts == 0] = np.nan
+    return means.astype(np.float32)
+
+
+def downsample_grid(grid: Grid, factor: int) -> Grid:
+    """
+    Downsample a (data, lon, lat) grid by an integer factor
+
+    Coordinates are block-averaged too, so the detectors' km-per-pixel factors
+    (derived from lon/lat spacing) scale with the level automatically.
+    """
+    data, lon, lat = grid
+    if factor <= 1:
+        return grid
+    return (
+        block_mean(data, factor),
+        _block_mean_1d(lon, factor),
+        _block_mean_1d(lat, factor),
+    )
+
+
+def level_for_max_pixels(shape: Tuple[int, int], max_pixels: Optional[int]) -> int:
+    """
+    Pick the finest power-of-two pyramid level whose grid fits in max_pixels
+
+    Args:
+        shape: Native grid shape (rows, cols)
+        max_pixels: Pixel budget, or None for native resolution
+
+    Returns:
+        Pyramid level (0 = native, n = downsampled by 2**n)
+    """
+    if not max_pixels or max_pixels <= 0:
+        return 0
+    rows, cols = shape
+    level = 0
+    while math.ceil(rows / 2 ** level) * math.ceil(cols / 2 ** level) > max_pixels:
+        if rows // 2 ** level <= 1 and cols // 2 ** level <= 1:
+            break
+        level += 1
+    return level
+
+
+def resolution_level(native_deg: float, resolution_deg: Optional[float], max_level: Optional[int] = None) -> int:
+    """
+    Finest power-of-two level whose pixel size (native_deg * 2**level) is at
+    least resolution_deg
+
+    Args:
+        native_deg: Native pixel size in degrees
+        resolution_deg: Target pixel size in degrees, or None for native
+        max_level: Coarsest level available (clamps the result)
+
+    Returns:
+        Pyramid level (0 = native, n = downsampled by 2**n)
+    """
+    if not resolution_deg or resolution_deg <= 0 or native_deg >= resolution_deg:
+        return 0
+    # Tolerance so an exact power-of-two ratio is not pushed up a level by rounding
+    level = max(0, int(math.ceil(math.log2(resolution_deg / native_deg) - 1e-9)))
+    return min(level, max_level) if max_level is not None else level
+
+
+def level_for_resolution(lon: np.ndarray, lat: np.ndarray, resolution_deg: Optional[float]) -> int:
+    """
+    Pick the finest power-of-two level whose pixel size is at least resolution_deg
+
+    Clamped to the level where the grid is a single pixel, so very coarse
+    targets return the coarsest available level.
+
+    Args:
+        lon: Native longitude coordinates
+        lat: Native latitude coordinates
+        resolution_deg: Target pixel size in degrees, or None for native
+
+    Returns:
+        Pyramid level (0 = native, n = downsampled by 2**n)
+    """
+    lat_res = abs(lat[1] - lat[0]) if len(lat) > 1 else 0.01
+    lon_res = abs(lon[1] - lon[0]) if len(lon) > 1 else 0.01
+    top = int(math.ceil(math.log2(max(len(lon), len(lat), 1))))
+    return resolution_level(max(lat_res, lon_res), resolution_deg, top)
+
+
+class GridPyramid:
+    """Lazily built power-of-two pyramid over a single grid"""
+
+    def __init__(self, data: np.ndarray, lon: np.ndarray, lat: np.ndarray):
+        self._levels = {0: (data, lon, lat)}
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._levels[0][0].shape
+
+    def level(self, n: int) -> Grid:
+        """Return level n, computing it from the native grid on first use"""
+        if n not in self._levels:
+            self._levels[n] = downsample_grid(self._levels[0], 2 ** n)
+        return self._levels[n]
+
+    def select(self, max_pixels: Optional[int] = None,
+               resolution_deg: Optional[float] = None) -> Tuple[int, Grid]:
+        """
+        Choose the level satisfying both max_pixels and resolution_deg
+
+        Returns:
+            Tuple of (level, (data, lon, lat))
+        """
+        _, lon, lat = self._levels[0]
+        n = max(
+            level_for_max_pixels(self.shape, max_pixels),
+            level_for_resolution(lon, lat, resolution_deg),
+        )
+        return n, self.level(n)
@@ -0,0 +1,281 @@
+"""
+Detection Scheduler
+Cost-aware admission control: estimates each request's runtime from its grid
+size and detectors, runs cheap (interactive) requests on a priority lane,
+large jobs on a batch lane, and rejects over-budget requests early. Both lanes
+have bounded queues, so overload turns into 503s instead of unbounded latency.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import logging
+from fastapi import HTTPException
+
+from app.pyramid import resolution_level
+
+logger = logging.getLogger(__name__)
+
+# Nominal grid spacing of the CMEMS products (degrees), for bbox-based estimates
+SST_RESOLUTION_DEG = 0.083
+CHL_RESOLUTION_DEG = 4.0 / 111.0
+
+
+@dataclass
+class CostModel:
+    """Linear runtime model: seconds = intercept + per_megapixel * pixels / 1e6"""
+    intercept: float
+    per_megapixel: float
+
+    def estimate(self, pixels: int) -> float:
+        return self.intercept + self.per_megapixel * pixels / 1e6
+
+
+# Conservative starting estimates (seconds); replaced by
+# DetectionScheduler.calibrate() when CALIBRATE_COST_MODELS=1
+DEFAULT_COST_MODELS: Dict[str, CostModel] = {
+    "thermal_fronts": CostModel(0.002, 0.25),
+    "chlorophyll_edges": CostModel(0.002, 0.08),
+    "eddies": CostModel(0.005, 0.60),
+    "blooms": CostModel(0.002, 0.20),
+    # Session reruns that reuse the cached gradient / blurred CHL / eddy
+    # regions and only redo thresholding, contouring or filtering
+    "thermal_fronts_cached": CostModel(0.001, 0.08),
+    "chlorophyll_edges_cached": CostModel(0.001, 0.04),
+    "blooms_cached": CostModel(0.001, 0.12),
+    "eddies_cached": CostModel(0.001, 0.05),
+}
+
+
+class AdmissionRejected(HTTPException):
+    """Request refused before running (413 over budget, 503 lane full)"""
+
+
+def bbox_pixels(south: float, west: float, north: float, east: float,
+                resolution_deg: float) -> int:
+    """Approximate grid cell count of a bbox at a product's resolution"""
+    rows = max(1, int(abs(north - south) / resolution_deg) + 1)
+    cols = max(1, int(abs(east - west) / resolution_deg) + 1)
+    return rows * cols
+
+
+def budgeted_pixels(south: float, west: float, north: float, east: float,
+                    product_resolution: float, max_pixels: Optional[int],
+                    resolution: Optional[float]) -> int:
+    """Cell count detection will run on for a bbox after pyramid downsampling"""
+    level = resolution_level(product_resolution, resolution)
+    pixels = bbox_pixels(south, west, north, east, product_resolution * 2 ** level)
+    return min(pixels, max_pixels) if max_pixels else pixels
+
+
+class DetectionScheduler:
+    """
+    Two-lane executor for detector work
+
+    Requests estimated under interactive_max_seconds run on the interactive
+    thread pool; the rest go to a smaller batch pool so large analyses cannot
+    starve map users. Each lane admits at most its workers plus its queue
+    limit at a time and answers 503 beyond that. Requests estimated over
+    max_request_seconds are rejected before any work is done.
+    """
+
+    def __init__(self, cost_models: Dict[str, CostModel] = None,
+                 interactive_max_seconds: float = 0.5,
+                 max_request_seconds: float = 60.0,
+                 interactive_workers: int = 4,
+                 batch_workers: int = 1,
+                 interactive_queue_limit: int = 32,
+                 batch_queue_limit: int = 8):
+        self.cost_models = dict(cost_models or DEFAULT_COST_MODELS)
+        self.interactive_max_seconds = interactive_max_seconds
+        self.max_request_seconds = max_request_seconds
+        self.interactive_workers = interactive_workers
+        self.batch_workers = batch_workers
+        self.interactive_queue_limit = interactive_queue_limit
+        self.batch_queue_limit = batch_queue_limit
+
+        self._interactive = ThreadPoolExecutor(interactive_workers, thread_name_prefix="detect-interactive")
+        self._batch = ThreadPoolExecutor(batch_workers, thread_name_prefix="detect-batch")
+        self._lock = threading.Lock()
+        self._pending = {"interactive": 0, "batch": 0}
+        self._counts = {"interactive": 0, "batch": 0, "rejected": 0}
+
+    @classmethod
+    def from_env(cls) -> "DetectionScheduler":
+        """Build a scheduler from SCHEDULER_* environment variables"""
+        env = os.environ.get
+        return cls(
+            interactive_max_seconds=float(env("SCHEDULER_INTERACTIVE_MAX_SECONDS", 0.5)),
+            max_request_seconds=float(env("SCHEDULER_MAX_REQUEST_SECONDS", 60)),
+            interactive_workers=int(env("SCHEDULER_INTERACTIVE_WORKERS", 4)),
+            batch_workers=int(env("SCHEDULER_BATCH_WORKERS", 1)),
+            interactive_queue_limit=int(env("SCHEDULER_INTERACTIVE_QUEUE_LIMIT", 32)),
+            batch_queue_limit=int(env("SCHEDULER_BATCH_QUEUE_LIMIT", 8)),
+        )
+
+    def estimate(self, detectors: Union[str, Sequence[str]], pixels: int) -> float:
+        """Estimated seconds to run the given detector(s) on a grid of `pixels` cells"""
+        if isinstance(detectors, str):
+            detectors = [detectors]
+        return sum(self.cost_models[name].estimate(pixels) for name in detectors)
+
+    def check_budget(self, cost: float, pixels: int) -> None:
+        """
+        Reject a request estimated over max_request_seconds without reserving a lane
+
+        Used for work that is admitted later (e.g. grid sessions, whose
+        detectors run on their own requests).
+
+        Raises:
+            AdmissionRejected: 413 if over budget
+        """
+        if cost > self.max_request_seconds:
+            with self._lock:
+                self._counts["rejected"] += 1
+            raise AdmissionRejected(
+                status_code=413,
+                detail=(
+                    f"Estimated cost {cost:.1f}s for {pixels} cells exceeds the "
+                    f"{self.max_request_seconds:.0f}s budget; reduce the bbox or "
+                    f"pass max_pixels/resolution to run on a coarser grid"
+                )
+            )
+
+    def admit(self, cost: float, pixels: int, batch: bool = False) -> str:
+        """
+        Decide the lane for a request with the given estimated cost or reject it
+
+        batch=True sends the request to the batch lane regardless of cost, for
+        work the cost models cannot see (e.g. many sequential CMEMS fetches).
+
+        Returns:
+            "interactive" or "batch"
+
+        Raises:
+            AdmissionRejected: 413 if over budget, 503 if the lane is full
+        """
+        self.check_budget(cost, pixels)
+        if cost <= self.interactive_max_seconds and not batch:
+            lane, capacity = "interactive", self.interactive_workers + self.interactive_queue_limit
+        else:
+            lane, capacity = "batch", self.batch_workers + self.batch_queue_limit
+
+        with self._lock:
+            if self._pending[lane] >= capacity:
+                self._counts["rejected"] += 1
+                raise AdmissionRejected(
+                    status_code=503,
+                    detail=f"{lane.capitalize()} lane is full; retry shortly",
+                    headers={"Retry-After": str(max(1, int(cost)))}
+                )
+            self._pending[lane] += 1
+        return lane
+
+    async def run(self, detectors: Union[str, Sequence[str]], shape: Tuple[int, ...],
+                  fn: Callable, *args):
+        """
+        Admit and run fn(*args) on the matching lane without blocking the event loop
+
+        Args:
+            detectors: Detector name(s) used for the cost estimate
+            shape: Grid shape the detectors will run on
+            fn: Blocking callable doing the detection
+        """
+        pixels = int(np.prod(shape))
+        return await self.run_with_cost(
+            self.estimate(detectors, pixels), pixels, detectors, fn, *args
+        )
+
+    async def run_with_cost(self, cost: float, pixels: int, label, fn: Callable, *args,
+                            batch: bool = False):
+        """
+        Admit and run fn(*args) using a precomputed cost estimate
+
+        Used when a request mixes products of different resolutions, e.g.
+        /ocean-features/real running SST and CHL detectors together, or when
+        the grid is fetched inside fn so the cost has to come from the bbox.
+        """
+        lane = self.admit(cost, pixels, batch)
+        executor = self._interactive if lane == "interactive" else self._batch
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._counts[lane] += 1
+                self._pending[lane] -= 1
+            logger.info(
+                f"Scheduled {label} on {lane} lane: {pixels} cells, "
+                f"estimated {cost:.3f}s, took {elapsed:.3f}s"
+            )
+
+    def calibrate(self, sizes: Sequence[int] = (128, 512)) -> Dict[str, CostModel]:
+        """
+        Fit each detector's cost model from timings on synthetic grids
+
+        Runs every detector at two grid sizes and fits the line through the
+        two points; the fitted models replace the current ones. The *_cached
+        models are timed on a GridSession rerun, after its first call has
+        computed the shared intermediate.
+        """
+        from app.ocean_features import OceanFeatureDetector
+        from app.sessions import GridSession
+        from app.warmup import synthetic_grid
+
+        detector = OceanFeatureDetector.from_env()
+
+        # name -> prepare(sst, chl, lon, lat), returning the call to time
+        def rerun(method: str, product: str):
+            def prepare(sst, chl, lon, lat):
+                session = GridSession(detector, sst if product == "sst" else chl, lon, lat)
+                getattr(session, method)()
+                return getattr(session, method)
+            return prepare
+
+        runners = {
+            "thermal_fronts": lambda sst, chl, lon, lat: lambda: detector.detect_thermal_fronts(sst, lon, lat),
+            "chlorophyll_edges": lambda sst, chl, lon, lat: lambda: detector.detect_chlorophyll_edges(chl, lon, lat),
+            "eddies": lambda sst, chl, lon, lat: lambda: detector.detect_eddies(sst, lon, lat),
+            "blooms": lambda sst, chl, lon, lat: lambda: detector.detect_phytoplankton_blooms(chl, lon, lat),
+            "thermal_fronts_cached": rerun("thermal_fronts", "sst"),
+            "chlorophyll_edges_cached": rerun("chlorophyll_edges", "chl"),
+            "eddies_cached": rerun("eddies", "sst"),
+            "blooms_cached": rerun("phytoplankton_blooms", "chl"),
+        }
+
+        small, large = sizes
+        for name, prepare in runners.items():
+            points = []
+            for size in (small, large):
+                run = prepare(*synthetic_grid(size))
+                start = time.perf_counter()
+                run()
+                points.append((size * size, time.perf_counter() - start))
+            (p0, t0), (p1, t1) = points
+            slope = max((t1 - t0) / (p1 - p0), 0.0) * 1e6
+            intercept = max(t0 - slope * p0 / 1e6, 0.0)
+            self.cost_models[name] = CostModel(intercept, slope)
+            logger.info(f"Calibrated {name}: {intercept * 1000:.1f}ms + {slope:.3f}s/MP")
+        return self.cost_models
+
+    def stats(self) -> Dict:
+        """Lane counters and current cost models"""
+        with self._lock:
+            return {
+                "completed": dict(self._counts),
+                "interactive_pending": self._pending["interactive"],
+                "batch_pending": self._pending["batch"],
+                "interactive_max_seconds": self.interactive_max_seconds,
+                "max_request_seconds": self.max_request_seconds,
+                "cost_models": {
+                    name: {"intercept": m.intercept, "per_megapixel": m.per_megapixel}
+                    for name, m in self.cost_models.items()
+                }
+            }
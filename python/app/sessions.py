@@ -0,0 +1,262 @@
+"""
+Grid Sessions
+Server-side handles for uploaded or fetched grids so threshold changes only
+redo the final thresholding/contour step of each detector
+
+Sessions live in the memory of the worker process that created them. Run a
+single uvicorn worker, or route by session ID (sticky sessions), when using
+them behind several workers; other workers answer 404.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import logging
+
+from app.masks import GridMask
+from app.ocean_features import OceanFeatureDetector
+
+logger = logging.getLogger(__name__)
+
+# Intermediate each detector reuses when a session reruns it
+DETECTOR_INTERMEDIATES = {
+    "thermal_fronts": "gradient_km",
+    "chlorophyll_edges": "chl_blurred",
+    "blooms": "chl_blurred",
+    "eddies": "eddy_regions",
+}
+
+
+def _nbytes(value) -> int:
+    """Bytes held by the arrays in a (possibly nested) intermediate"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return 0
+
+
+class GridSession:
+    """
+    A single grid plus lazily computed, threshold-independent intermediates
+
+    Intermediates are computed on first use and kept for the session lifetime:
+    the land mask, gradient magnitude (°C/km) for fronts, blurred
+    log-normalized CHL for edges and blooms, and the smoothed Okubo-Weiss
+    field with labeled regions for eddies.
+    """
+
+    def __init__(self, detector: OceanFeatureDetector, data: np.ndarray,
+                 lon: np.ndarray, lat: np.ndarray, source: Optional[Dict] = None):
+        self.session_id = uuid.uuid4().hex
+        self.detector = detector
+        self.data = data
+        self.lon = lon
+        self.lat = lat
+        self.source = source or {"type": "upload"}
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self._intermediates: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _intermediate(self, name: str, compute):
+        """Return a cached intermediate, computing it once under the session lock"""
+        with self._lock:
+            if name not in self._intermediates:
+                logger.info(f"Session {self.session_id}: computing {name}")
+                self._intermediates[name] = compute()
+            return self._intermediates[name]
+
+    @property
+    def mask(self) -> GridMask:
+        """Land mask of the session grid"""
+        return self._intermediate("mask", lambda: GridMask.from_data(self.data))
+
+    def _chl_blurred(self):
+        mask = self.mask
+        return self._intermediate(
+            "chl_blurred",
+            lambda: self.detector.chlorophyll_blurred(self.data, mask)
+        )
+
+    def thermal_fronts(self, threshold: float = 0.5, as_columns: bool = False,
+                       mode: str = "contour"):
+        """Thermal fronts at the given threshold (°C/km) as outlines or centerlines"""
+        mask = self.mask
+        gradient_km = self._intermediate(
+            "gradient_km",
+            lambda: self.detector.thermal_gradient_km(self.data, self.lon, self.lat, mask)
+        )
+        return self.detector.fronts_from_gradient(
+            gradient_km, self.lon, self.lat, threshold, as_columns=as_columns, mode=mode
+        )
+
+    def chlorophyll_edges(self, low_thresh: float = 0.1, high_thresh: float = 0.3,
+                          as_columns: bool = False):
+        """Chlorophyll edges at the given Canny thresholds"""
+        return self.detector.edges_from_blurred(
+            self._chl_blurred(), self.lon, self.lat, low_thresh, high_thresh,
+            as_columns=as_columns, mask=self.mask
+        )
+
+    def phytoplankton_blooms(self, low_thresh: float = 0.1, high_thresh: float = 0.3,
+                             min_area: int = 100, as_columns: bool = False):
+        """Phytoplankton blooms at the given Canny thresholds and minimum area"""
+        return self.detector.blooms_from_blurred(
+            self._chl_blurred(), self.data, self.lon, self.lat, low_thresh, high_thresh,
+            min_area, as_columns=as_columns, mask=self.mask
+        )
+
+    def eddies(self, min_radius_km: float = 10.0, as_columns: bool = False):
+        """Eddies with at least the given radius (km)"""
+        mask = self.mask
+        regions = self._intermediate(
+            "eddy_regions",
+            lambda: self.detector.eddy_regions(self.data, self.lon, self.lat, mask)
+        )
+        return self.detector.eddies_from_regions(
+            regions, self.data, self.lon, self.lat, min_radius_km, as_columns=as_columns
+        )
+
+    def cost_label(self, detector_name: str) -> str:
+        """
+        Scheduler cost model for running a detector on this session: the
+        cheaper "<name>_cached" once its intermediate has been computed
+        """
+        with self._lock:
+            cached = DETECTOR_INTERMEDIATES[detector_name] in self._intermediates
+        return f"{detector_name}_cached" if cached else detector_name
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the grid and its computed intermediates"""
+        # No session lock: the store sizes sessions while detectors may be computing
+        intermediates = sum(_nbytes(v) for v in list(self._intermediates.values()))
+        return self.data.nbytes + self.lon.nbytes + self.lat.nbytes + intermediates
+
+    @property
+    def cached_intermediates(self) -> List[str]:
+        with self._lock:
+            return sorted(self._intermediates)
+
+    def describe(self) -> Dict:
+        """Session summary returned by the API"""
+        return {
+            "session_id": self.session_id,
+            "data_shape": list(self.data.shape),
+            "source": self.source,
+            "cached_intermediates": self.cached_intermediates,
+            "memory_mb": round(self.nbytes / 1e6, 2)
+        }
+
+
+class SessionTooLarge(ValueError):
+    """Grid exceeds the per-session pixel budget"""
+
+
+class SessionStore:
+    """
+    Thread-safe LRU store of grid sessions with an idle timeout
+
+    Bounded by session count and by the bytes held across all sessions
+    (grids plus intermediates, which grow as detectors are used); the least
+    recently used sessions are evicted first. Grids over max_pixels are
+    refused outright.
+    """
+
+    def __init__(self, max_sessions: int = 64, idle_timeout_seconds: float = 1800,
+                 max_bytes: int = 512 * 1024 * 1024, max_pixels: int = 4 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self._sessions: "OrderedDict[str, GridSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        """Build a store from SESSION_* environment variables"""
+        env = os.environ.get
+        return cls(
+            max_sessions=int(env("SESSION_MAX_COUNT", 64)),
+            idle_timeout_seconds=float(env("SESSION_IDLE_TIMEOUT_SECONDS", 1800)),
+            max_bytes=int(float(env("SESSION_MAX_MB", 512)) * 1024 * 1024),
+            max_pixels=int(env("SESSION_MAX_PIXELS", 4 * 1024 * 1024)),
+        )
+
+    def check_pixels(self, pixels: int) -> None:
+        """
+        Raises:
+            SessionTooLarge: if a grid of `pixels` cells may not be stored
+        """
+        if pixels > self.max_pixels:
+            raise SessionTooLarge(
+                f"Grid of {pixels} cells exceeds the {self.max_pixels} cell session limit; "
+                f"pass max_pixels/resolution to store a coarser pyramid level"
+            )
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        expired = [
+            sid for sid, session in self._sessions.items()
+            if now - session.last_used > self.idle_timeout_seconds
+        ]
+        for sid in expired:
+            del self._sessions[sid]
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Drop least recently used sessions (never `keep`) until within budget"""
+        total = sum(session.nbytes for session in self._sessions.values())
+        for sid in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions and total <= self.max_bytes:
+                break
+            if sid == keep:
+                continue
+            total -= self._sessions.pop(sid).nbytes
+            logger.info(f"Evicted grid session {sid}")
+
+    def add(self, session: GridSession) -> GridSession:
+        """
+        Register a session, evicting the least recently used ones if over budget
+
+        Raises:
+            SessionTooLarge: if the grid exceeds max_pixels
+        """
+        self.check_pixels(session.data.size)
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+            self._evict(keep=session.session_id)
+        return session
+
+    def get(self, session_id: str) -> Optional[GridSession]:
+        """Look up a live session and mark it as recently used"""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.monotonic()
+                self._sessions.move_to_end(session_id)
+                # Intermediates computed since the last call count towards the budget
+                self._evict(keep=session_id)
+            return session
+
+    def remove(self, session_id: str) -> bool:
+        """Drop a session; returns False if it did not exist"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(session.nbytes for session in self._sessions.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,249 @@
+"""
+Shared Grid Store
+Memory-mapped grid files shared zero-copy between uvicorn/pool worker processes,
+with cross-process reference counting so a grid is deleted once no worker holds it
+"""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Hashable, List, Optional, Tuple
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+Grid = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+_ARRAY_NAMES = ("data", "lon", "lat")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def default_root() -> str:
+    """tmpfs-backed directory when available so mapped pages never hit disk"""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "abfi-grids")
+
+
+class SharedGridStore:
+    """
+    Directory of memory-mapped (data, lon, lat) grids keyed by cache key
+
+    Each grid is published once as three .npy files in its own directory and
+    opened by every process with np.load(mmap_mode="r"), so the pages are shared
+    by the OS page cache instead of copied per worker. A `refs` file lists the
+    PID of every live handle across processes (one line per reference); it is
+    only touched under an exclusive flock on the grid's lock file. The
+    directory and lock file are removed when no reference remains - existing
+    mappings stay valid after unlink on POSIX.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_age_seconds: float = 24 * 3600):
+        self.root = root or default_root()
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(self.root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["SharedGridStore"]:
+        """Build a store when SHARED_GRID_STORE is enabled, else None"""
+        if os.environ.get("SHARED_GRID_STORE", "").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(root=os.environ.get("SHARED_GRID_DIR") or None)
+
+    # ------------------------------------------------------------------
+    # Paths and locking
+    # ------------------------------------------------------------------
+
+    def _name(self, key: Hashable) -> str:
+        return hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+
+    def _grid_dir(self, key: Hashable) -> str:
+        return os.path.join(self.root, self._name(key))
+
+    def _lock_path(self, name: str) -> str:
+        return os.path.join(self.root, name + ".lock")
+
+    def _locked(self, key: Hashable):
+        return self._locked_name(self._name(key))
+
+    @contextmanager
+    def _locked_name(self, name: str):
+        lock_path = self._lock_path(name)
+        while True:
+            lock_file = open(lock_path, "a+")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # The lock file may have been removed (with its grid) while we
+            # waited; a lock on the unlinked inode would not exclude anyone
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _read_refs(self, grid_dir: str) -> List[int]:
+        """PIDs holding a reference, one entry per reference"""
+        try:
+            with open(os.path.join(grid_dir, "refs")) as f:
+                return [int(line) for line in f.read().split()]
+        except FileNotFoundError:
+            return []
+
+    def _write_refs(self, grid_dir: str, refs: List[int]) -> None:
+        with open(os.path.join(grid_dir, "refs"), "w") as f:
+            f.write("\n".join(str(pid) for pid in refs))
+
+    def _add_ref(self, grid_dir: str) -> None:
+        self._write_refs(grid_dir, self._read_refs(grid_dir) + [os.getpid()])
+
+    def _remove_locked(self, name: str, grid_dir: str) -> None:
+        """Delete a grid and its lock file; the caller holds the lock"""
+        shutil.rmtree(grid_dir, ignore_errors=True)
+        try:
+            os.unlink(self._lock_path(name))
+        except FileNotFoundError:
+            pass
+
+    def _map(self, grid_dir: str) -> Grid:
+        return tuple(
+            np.load(os.path.join(grid_dir, f"{name}.npy"), mmap_mode="r")
+            for name in _ARRAY_NAMES
+        )
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def acquire(self, key: Hashable) -> Optional[Grid]:
+        """Map an already published grid and take a reference, or return None"""
+        grid_dir = self._grid_dir(key)
+        with self._locked(key):
+            if not os.path.isdir(grid_dir):
+                return None
+            self._add_ref(grid_dir)
+            return self._map(grid_dir)
+
+    def publish(self, key: Hashable, grid: Grid) -> Grid:
+        """Write a grid (unless another process already did) and take a reference"""
+        with self._locked(key):
+            return self._publish_locked(key, grid)
+
+    def _publish_locked(self, key: Hashable, grid: Grid) -> Grid:
+        grid_dir = self._grid_dir(key)
+        if not os.path.isdir(grid_dir):
+            # Write into a private directory, then rename into place atomically
+            staging = os.path.join(self.root, f".staging-{uuid.uuid4().hex}")
+            os.makedirs(staging)
+            for name, array in zip(_ARRAY_NAMES, grid):
+                np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(array))
+            self._write_refs(staging, [])
+            os.rename(staging, grid_dir)
+            logger.info(f"Published shared grid {self._name(key)} shape={grid[0].shape}")
+
+        self._add_ref(grid_dir)
+        return self._map(grid_dir)
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Optional[Grid]]) -> Optional[Grid]:
+        """
+        Map a shared grid, fetching and publishing it on a miss
+
+        The per-key lock is held during the fetch so other workers wait for
+        the first one instead of each downloading the same grid.
+        """
+        grid = self.acquire(key)
+        if grid is not None:
+            return grid
+
+        with self._locked(key):
+            grid_dir = self._grid_dir(key)
+            if os.path.isdir(grid_dir):
+                self._add_ref(grid_dir)
+                return self._map(grid_dir)
+            grid = fetch()
+            if grid is None:
+                return None
+            return self._publish_locked(key, grid)
+
+    def release(self, key: Hashable) -> None:
+        """Drop one of this process's references; the grid is removed when none remain"""
+        grid_dir = self._grid_dir(key)
+        with self._locked(key):
+            if not os.path.isdir(grid_dir):
+                return
+            refs = self._read_refs(grid_dir)
+            if os.getpid() in refs:
+                refs.remove(os.getpid())
+            if refs:
+                self._write_refs(grid_dir, refs)
+                return
+            self._remove_locked(self._name(key), grid_dir)
+            logger.info(f"Removed shared grid {self._name(key)}")
+
+    def sweep(self) -> int:
+        """
+        Drop references held by dead processes and remove unreferenced grids
+
+        Guards against references leaked by crashed workers. Each grid is
+        checked under its lock, so grids mapped by a live process (or just
+        republished by one) are never removed. Staging directories left by a
+        publisher that died mid-write are removed once older than
+        max_age_seconds.
+
+        Returns:
+            Number of grids removed
+        """
+        removed = 0
+        cutoff = time.time() - self.max_age_seconds
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(".staging-"):
+                if entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+
+            if entry.is_dir():
+                with self._locked_name(entry.name):
+                    if not os.path.isdir(entry.path):
+                        continue
+                    refs = [pid for pid in self._read_refs(entry.path) if _pid_alive(pid)]
+                    if refs:
+                        self._write_refs(entry.path, refs)
+                        continue
+                    self._remove_locked(entry.name, entry.path)
+                    removed += 1
+            elif entry.name.endswith(".lock"):
+                # Lock file of a fetch that failed before publishing
+                name = entry.name[:-len(".lock")]
+                with self._locked_name(name):
+                    if not os.path.isdir(os.path.join(self.root, name)):
+                        self._remove_locked(name, os.path.join(self.root, name))
+        return removed
+
+    def stats(self) -> dict:
+        """Grid count and bytes currently held in the store"""
+        count, nbytes = 0, 0
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and not entry.name.startswith(".staging-"):
+                count += 1
+                nbytes += sum(f.stat().st_size for f in os.scandir(entry.path))
+        return {"root": self.root, "grids": count, "bytes": nbytes}
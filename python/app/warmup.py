@@ -0,0 +1,138 @@
+"""
+Startup Warm-up
+Preloads the heavy detection libraries and runs every detector once on a tiny
+synthetic grid so the first real request doesn't pay import/JIT costs.
+
+Run `python -m app.warmup` for an import-time benchmark.
+"""
+
+import importlib
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import logging
+
+from app.ocean_features import OceanFeatureDetector
+
+logger = logging.getLogger(__name__)
+
+# Modules the detectors import lazily, in the order they are first needed
+HEAVY_MODULES = [
+    "cv2",
+    "scipy.ndimage",
+    "skimage.measure",
+    "skimage.morphology",
+]
+
+# Only needed for live Copernicus fetches; missing is not an error
+OPTIONAL_MODULES = [
+    "copernicusmarine",
+]
+
+
+def synthetic_grid(size: int = 64) -> tuple:
+    """
+    Small SST/CHL-like grid with a sharp front and a warm core
+
+    Returns:
+        Tuple of (sst, chl, lon, lat)
+    """
+    lat = np.linspace(35.0, 35.0 + 0.083 * (size - 1), size, dtype=np.float32)
+    lon = np.linspace(-75.0, -75.0 + 0.083 * (size - 1), size, dtype=np.float32)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32)
+
+    front = 4.0 * np.tanh((xx - size / 2) / 2.0)
+    core = 3.0 * np.exp(-((xx - size / 3) ** 2 + (yy - size / 3) ** 2) / (2 * (size / 8) ** 2))
+    sst = (20.0 + front + core).astype(np.float32)
+    chl = (10 ** (-1.0 + 1.5 * (xx / size))).astype(np.float32)
+    return sst, chl, lon, lat
+
+
+def import_modules() -> Dict[str, float]:
+    """
+    Import the heavy modules and time each one
+
+    Returns:
+        Seconds spent per module (already-imported modules cost ~0)
+    """
+    timings = {}
+    for name in HEAVY_MODULES + OPTIONAL_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            if name not in OPTIONAL_MODULES:
+                raise
+            logger.info(f"Warm-up: optional module {name} not installed")
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def warm_up(detector: Optional[OceanFeatureDetector] = None) -> Dict[str, float]:
+    """
+    Import heavy modules and run each detector once on a synthetic grid
+
+    Args:
+        detector: Detector instance to exercise (a new one if omitted)
+
+    Returns:
+        Seconds spent per step, keyed by module or detector name
+    """
+    detector = detector or OceanFeatureDetector.from_env()
+    timings = {f"import:{name}": t for name, t in import_modules().items()}
+
+    sst, chl, lon, lat = synthetic_grid()
+    steps = {
+        "thermal_fronts": lambda: detector.detect_thermal_fronts(sst, lon, lat, threshold=0.5),
+        "chlorophyll_edges": lambda: detector.detect_chlorophyll_edges(chl, lon, lat),
+        "eddies": lambda: detector.detect_eddies(sst, lon, lat, min_radius_km=1.0),
+        "blooms": lambda: detector.detect_phytoplankton_blooms(chl, lon, lat, min_area=10),
+    }
+    for name, step in steps.items():
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+
+    logger.info(f"Warm-up finished in {sum(timings.values()):.2f}s")
+    return timings
+
+
+def benchmark_imports(runs: int = 5) -> Dict[str, float]:
+    """
+    Measure cold `import app.main` time in fresh interpreters
+
+    Also reports the cold import time of the heavy modules and the warm-up cost,
+    i.e. what the first request would otherwise pay.
+
+    Returns:
+        Median seconds per measurement
+    """
+    import statistics
+    import subprocess
+    import sys
+
+    def cold(statement: str) -> float:
+        code = (
+            "import time; t = time.perf_counter(); "
+            f"{statement}; print(time.perf_counter() - t)"
+        )
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, "-c", code], check=True, capture_output=True, text=True
+            ).stdout
+            samples.append(float(output.strip().splitlines()[-1]))
+        return statistics.median(samples)
+
+    results = {"import app.main": cold("import app.main")}
+    for name in HEAVY_MODULES:
+        results[f"import {name}"] = cold(f"import {name}")
+    results["warm_up()"] = cold("import app.warmup as w; w.warm_up()")
+    return results
+
+
+if __name__ == "__main__":
+    for label, seconds in benchmark_imports().items():
+        print(f"{label:<28} {seconds * 1000:8.1f} ms")